@@ -25,7 +25,8 @@ def analyze_video_coverage(video_path, detection_skip=1, fade_in_sec=0.0, fade_o
 
     # 导入模型
     sys.path.insert(0, str(Path(__file__).parent))
-    from nodes import detect_only
+    from nodes import detect_only, load_florence2_model
+    from timeline import MaskTimeline
 
     print("\n" + "="*70)
     print("  视频水印检测覆盖率分析")
@@ -54,17 +55,9 @@ def analyze_video_coverage(video_path, detection_skip=1, fade_in_sec=0.0, fade_o
     # 加载模型
     print(f"\n加载 Florence-2 模型...")
     import torch
-    from transformers import AutoProcessor, Florence2ForConditionalGeneration
 
     device = "mps" if torch.backends.mps.is_available() else "cpu"
-
-    model = Florence2ForConditionalGeneration.from_pretrained(
-        "florence-community/Florence-2-large"
-    ).to(device).eval()
-
-    processor = AutoProcessor.from_pretrained(
-        "florence-community/Florence-2-large"
-    )
+    model, processor = load_florence2_model(device)
 
     print(f"✓ 模型已加载到 {device}")
 
@@ -114,43 +107,27 @@ def analyze_video_coverage(video_path, detection_skip=1, fade_in_sec=0.0, fade_o
     print("Pass 2: 时间扩展模拟")
     print(f"{'='*70}")
 
-    # 模拟时间扩展后哪些帧会被处理
-    covered_frames = set()
-
-    for frame_idx, has_watermark in detections.items():
-        if has_watermark:
-            # 扩展时间范围
-            start = max(0, frame_idx - fade_in_frames)
-            end = min(total_frames - 1, frame_idx + fade_out_frames)
-            for f in range(start, end + 1):
-                covered_frames.add(f)
+    # 模拟时间扩展后哪些帧会被处理（与节点一致：覆盖到下一个检测点之后的 fade_out）
+    # 这里只关心是否覆盖，所有检测到水印的点共用一个占位 bbox
+    timeline = MaskTimeline.from_detections(
+        {frame_idx: [[0, 0, 1, 1]] for frame_idx, has_watermark in detections.items() if has_watermark},
+        detection_frames, total_frames, fade_in_frames, fade_out_frames
+    )
+    covered_count = timeline.covered_frames()
 
     print(f"\n扩展后覆盖范围：")
-    print(f"  覆盖帧数: {len(covered_frames)}/{total_frames}")
-    print(f"  覆盖率: {len(covered_frames)/total_frames*100:.1f}%")
-    print(f"  未覆盖: {total_frames - len(covered_frames)} 帧")
+    print(f"  覆盖帧数: {covered_count}/{total_frames}")
+    print(f"  覆盖率: {covered_count/total_frames*100:.1f}%")
+    print(f"  未覆盖: {total_frames - covered_count} 帧")
 
-    # 找出未覆盖的时间段
-    uncovered = sorted(set(range(total_frames)) - covered_frames)
+    # 未覆盖的时间段 [start, end)
+    uncovered_runs = timeline.uncovered_runs()
 
-    if uncovered:
-        print(f"\n⚠️  发现 {len(uncovered)} 帧未被覆盖！")
+    if uncovered_runs:
+        print(f"\n⚠️  发现 {total_frames - covered_count} 帧未被覆盖！")
         print(f"\n未覆盖的时间段：")
 
-        # 合并连续的帧为时间段
-        segments = []
-        if uncovered:
-            start = uncovered[0]
-            prev = uncovered[0]
-
-            for frame in uncovered[1:]:
-                if frame != prev + 1:
-                    # 新段落
-                    segments.append((start, prev))
-                    start = frame
-                prev = frame
-
-            segments.append((start, prev))
+        segments = [(start, end - 1) for start, end in uncovered_runs]
 
         for i, (start, end) in enumerate(segments[:10], 1):  # 只显示前10个
             start_time = start / fps
@@ -181,25 +158,15 @@ def analyze_video_coverage(video_path, detection_skip=1, fade_in_sec=0.0, fade_o
                label='检测点 (红=发现水印)', marker='|')
 
     # 绘制覆盖范围（绿色）
-    if covered_frames:
-        # 合并连续帧
-        covered_sorted = sorted(covered_frames)
-        start = covered_sorted[0]
-        prev = covered_sorted[0]
-
-        for frame in covered_sorted[1:] + [covered_sorted[-1] + 2]:
-            if frame != prev + 1:
-                # 绘制这一段
-                ax.barh(0, prev - start + 1, left=start, height=0.5,
-                       color='green', alpha=0.6, zorder=2)
-                start = frame
-            prev = frame
+    for start, end, _ in timeline.runs():
+        ax.barh(0, end - start, left=start, height=0.5,
+               color='green', alpha=0.6, zorder=2)
 
     ax.set_ylim(-0.5, 0.5)
     ax.set_xlim(0, total_frames)
     ax.set_xlabel(f'帧数 (总计 {total_frames} 帧, {total_frames/fps:.1f}秒 @ {fps:.1f}fps)', fontsize=12)
     ax.set_yticks([])
-    ax.set_title(f'水印检测覆盖率分析 - 覆盖: {len(covered_frames)/total_frames*100:.1f}%',
+    ax.set_title(f'水印检测覆盖率分析 - 覆盖: {covered_count/total_frames*100:.1f}%',
                 fontsize=14, fontweight='bold')
 
     # 添加图例
@@ -228,7 +195,7 @@ def analyze_video_coverage(video_path, detection_skip=1, fade_in_sec=0.0, fade_o
     print("参数优化建议")
     print(f"{'='*70}")
 
-    coverage_rate = len(covered_frames) / total_frames
+    coverage_rate = covered_count / total_frames
 
     if coverage_rate < 0.95:
         print(f"\n⚠️  当前覆盖率 {coverage_rate*100:.1f}% 偏低，建议优化：")
@@ -240,10 +207,7 @@ def analyze_video_coverage(video_path, detection_skip=1, fade_in_sec=0.0, fade_o
         print(f"  当前: fade_in={fade_in_sec}s, fade_out={fade_out_sec}s")
 
         # 计算需要的扩展范围
-        max_gap = 0
-        if len(uncovered) > 1:
-            gaps = [uncovered[i+1] - uncovered[i] for i in range(len(uncovered)-1)]
-            max_gap = max(gaps) if gaps else 0
+        max_gap = max((end - start for start, end in uncovered_runs), default=0)
 
         suggested_extend = max(1.0, max_gap / fps * 1.5)
         print(f"  建议: fade_in={suggested_extend:.1f}s, fade_out={suggested_extend:.1f}s")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+检测框运算基准测试 - 对比逐框Python循环和 bbox_ops 的向量化实现
+用法：python benchmark_bbox_ops.py [框数量列表]
+
+模拟多提示词或大量关键帧运行时收集到的成千上万个检测框（围绕少数水印位置抖动），
+分别测量面积过滤、两两IoU矩阵、NMS去重、重叠合并、外扩与裁剪的耗时，并校验两种实现结果一致。
+不需要加载任何模型。
+"""
+import sys
+import time
+import numpy as np
+
+from bbox_ops import area_percent, as_boxes, iou_matrix, nms, pad_and_clip, union_merge
+
+IMAGE_SIZE = (1920, 1080)
+
+
+def make_boxes(count, seed=0):
+    """围绕几个水印位置随机抖动的检测框，外加少量随机框"""
+    rng = np.random.default_rng(seed)
+    centers = rng.integers([100, 100], [IMAGE_SIZE[0] - 300, IMAGE_SIZE[1] - 100], size=(8, 2))
+    picks = centers[rng.integers(0, len(centers), size=count)]
+    jitter = rng.integers(-6, 7, size=(count, 4))
+    boxes = np.concatenate([picks, picks + [200, 60]], axis=1) + jitter
+    noise = rng.random(count) < 0.1
+    boxes[noise, :2] = rng.integers(0, [IMAGE_SIZE[0] - 400, IMAGE_SIZE[1] - 300], size=(noise.sum(), 2))
+    boxes[noise, 2:] = boxes[noise, :2] + rng.integers(10, 400, size=(noise.sum(), 2))
+    return boxes.tolist()
+
+
+# ---------- 逐框循环实现（重构前 nodes.py 中的写法） ----------
+
+def loop_iou(bbox, other):
+    x1, y1, x2, y2 = bbox
+    ex1, ey1, ex2, ey2 = other
+    xi1, yi1, xi2, yi2 = max(x1, ex1), max(y1, ey1), min(x2, ex2), min(y2, ey2)
+    if xi1 < xi2 and yi1 < yi2:
+        inter_area = (xi2 - xi1) * (yi2 - yi1)
+        union_area = (x2 - x1) * (y2 - y1) + (ex2 - ex1) * (ey2 - ey1) - inter_area
+        return inter_area / union_area if union_area > 0 else 0
+    return 0
+
+
+def loop_area_filter(bboxes, max_percent):
+    image_area = IMAGE_SIZE[0] * IMAGE_SIZE[1]
+    return [bbox for bbox in bboxes if (bbox[2] - bbox[0]) * (bbox[3] - bbox[1]) / image_area * 100 <= max_percent]
+
+
+def loop_iou_matrix(bboxes):
+    return [[loop_iou(bbox, other) for other in bboxes] for bbox in bboxes]
+
+
+def loop_nms(bboxes, iou_threshold=0.5):
+    kept = []
+    for bbox in bboxes:
+        if not any(loop_iou(bbox, existing) > iou_threshold for existing in kept):
+            kept.append(bbox)
+    return kept
+
+
+def loop_union_merge(bboxes):
+    merged = [list(bbox) for bbox in bboxes]
+    changed = True
+    while changed:
+        changed = False
+        result = []
+        for window in merged:
+            for other in result:
+                if window[0] < other[2] and other[0] < window[2] and window[1] < other[3] and other[1] < window[3]:
+                    other[0], other[1] = min(other[0], window[0]), min(other[1], window[1])
+                    other[2], other[3] = max(other[2], window[2]), max(other[3], window[3])
+                    changed = True
+                    break
+            else:
+                result.append(window)
+        merged = result
+    return merged
+
+
+def loop_pad_and_clip(bboxes, padding):
+    width, height = IMAGE_SIZE
+    return [[max(0, x1 - padding), max(0, y1 - padding), min(width, x2 + padding), min(height, y2 + padding)]
+            for x1, y1, x2, y2 in bboxes]
+
+
+def timed(run, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = run()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def benchmark(counts=(100, 1000, 5000)):
+    print(f"=== 检测框运算基准测试 ===")
+    print(f"图像尺寸: {IMAGE_SIZE[0]}x{IMAGE_SIZE[1]}")
+    print()
+
+    print(f"{'运算':<14} {'框数量':>8} {'循环 (ms)':>12} {'向量化 (ms)':>12} {'加速':>8} {'一致':>4}")
+    print("-" * 64)
+    for count in counts:
+        bboxes = make_boxes(count)
+        boxes = as_boxes(bboxes)
+        # 两两IoU矩阵是 O(N²) 的，循环版本只在较小规模上测量
+        iou_count = min(count, 2000)
+        cases = [
+            ("面积过滤", lambda: loop_area_filter(bboxes, 1.0),
+             lambda: boxes[area_percent(boxes, IMAGE_SIZE) <= 1.0].tolist()),
+            ("IoU矩阵", lambda: loop_iou_matrix(bboxes[:iou_count]),
+             lambda: iou_matrix(bboxes[:iou_count], bboxes[:iou_count])),
+            ("NMS去重", lambda: loop_nms(bboxes), lambda: as_boxes(bboxes)[nms(bboxes)].tolist()),
+            ("重叠合并", lambda: loop_union_merge(bboxes), lambda: union_merge(bboxes).tolist()),
+            ("外扩与裁剪", lambda: loop_pad_and_clip(bboxes, 10), lambda: pad_and_clip(bboxes, 10, IMAGE_SIZE).tolist()),
+        ]
+        for name, loop_run, vector_run in cases:
+            repeat = 1 if count >= 1000 else 5
+            loop_time, loop_result = timed(loop_run, repeat)
+            vector_time, vector_result = timed(vector_run, repeat)
+            if name == "IoU矩阵":
+                same = np.allclose(loop_result, vector_result)
+            else:
+                same = loop_result == vector_result
+            size = iou_count if name == "IoU矩阵" else count
+            print(f"{name:<14} {size:>8} {loop_time * 1000:>12.2f} {vector_time * 1000:>12.2f} "
+                  f"{loop_time / vector_time:>7.1f}x {'✓' if same else '✗':>4}")
+        print()
+
+
+if __name__ == "__main__":
+    counts = [int(count) for count in sys.argv[1].split(",")] if len(sys.argv) > 1 else (100, 1000, 5000)
+    benchmark(counts)
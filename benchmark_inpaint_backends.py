@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+修复后端基准测试 - 对比 LaMA 与 OpenCV 经典修复（telea / navier_stokes）和 smear 填充的单帧延迟
+用法：python benchmark_inpaint_backends.py [视频路径] [帧数] [后端列表]
+
+测试帧分别缩放到 720p 和 1080p，使用同一个右下角水印框，通过节点的裁剪区域修复流程
+（与 inpaint_backend 选项相同的代码路径）逐帧修复，输出每帧耗时、每秒帧数，
+以及与 LaMA 结果在掩码区域内的平均像素差。LaMA 模型无法加载时跳过 LaMA，只测经典后端。
+"""
+import sys
+import time
+from pathlib import Path
+import cv2
+import numpy as np
+import torch
+
+# 导入节点代码
+from nodes import INPAINT_BACKENDS, SoraVideoWatermarkRemover, load_lama_model, pad_and_clip
+from benchmark_execution import load_frames
+
+RESOLUTIONS = [("720p", 1280, 720), ("1080p", 1920, 1080)]
+
+
+def resize_frames(frames, width, height):
+    resized = [cv2.resize(frame.numpy(), (width, height), interpolation=cv2.INTER_AREA) for frame in frames]
+    return torch.from_numpy(np.stack(resized))
+
+
+def benchmark(video_path=None, num_frames=8, backends=INPAINT_BACKENDS):
+    node = SoraVideoWatermarkRemover()
+    print(f"=== 修复后端基准测试 ===")
+    print(f"使用设备: {node.device}")
+
+    frames = load_frames(video_path, num_frames)
+    if len(frames) == 0:
+        print("❌ 无法读取视频")
+        return
+    print(f"测试帧: {len(frames)} 帧")
+    print()
+
+    backends = list(backends)
+    if "lama" in backends:
+        print("加载LaMA模型...")
+        try:
+            node.lama_model = load_lama_model(node.device)
+            print("✓ 模型加载完成")
+        except Exception as e:
+            print(f"⚠️  LaMA模型加载失败，跳过LaMA: {e}")
+            backends.remove("lama")
+        print()
+
+    with torch.inference_mode():
+        for name, width, height in RESOLUTIONS:
+            test_frames = resize_frames(frames, width, height)
+            bboxes = [[width - 220, height - 80, width - 20, height - 20]]
+            mask = torch.zeros(height, width, dtype=torch.bool)
+            for x1, y1, x2, y2 in pad_and_clip(bboxes, 10, (width, height)).tolist():
+                mask[y1:y2 + 1, x1:x2 + 1] = True
+
+            print("=" * 64)
+            print(f"{name} ({width}x{height})")
+            print(f"{'后端':<16} {'每帧 (ms)':>12} {'帧/秒':>10} {'与LaMA平均差':>14}")
+            print("-" * 64)
+            reference = None
+            for backend in backends:
+                node._select_inpaint_engine(backend)
+                # 预热一次，不计入耗时
+                node._render_frames(test_frames[:1], bboxes)
+                start = time.time()
+                output = torch.stack([
+                    node._render_frames(test_frames[i:i + 1], bboxes)[0]
+                    for i in range(len(test_frames))
+                ])
+                latency = (time.time() - start) / len(test_frames)
+                if backend == "lama":
+                    reference = output
+                difference = "-" if reference is None else f"{(output - reference)[:, mask].abs().mean() * 255:.2f}"
+                print(f"{backend:<16} {latency * 1000:>12.1f} {1 / latency:>10.2f} {difference:>14}")
+            print("=" * 64)
+            print()
+    node.render_stats = node._empty_render_stats()
+
+
+if __name__ == "__main__":
+    video_path = Path(sys.argv[1]) if len(sys.argv) > 1 else None
+    num_frames = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    backends = sys.argv[3].split(",") if len(sys.argv) > 3 else INPAINT_BACKENDS
+
+    benchmark(video_path, num_frames, backends)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+LaMA 修复基准测试 - 对比逐帧修复和跨帧批量修复的吞吐量
+用法：python benchmark_inpainting.py [视频路径] [帧数] [批大小列表]
+
+所有帧使用同一个右下角水印框（相当于一条跨越整段视频的水印轨迹），
+先用 inpaint_batch_size=1（逐个裁剪区域调用 iopaint）修复，再用各个批大小修复，
+输出每秒修复帧数、相对逐帧的加速比，以及与逐帧结果的最大像素差。
+"""
+import sys
+import time
+from pathlib import Path
+import torch
+
+# 导入节点代码
+from nodes import SoraVideoWatermarkRemover, load_lama_model
+from benchmark_execution import load_frames
+
+
+def render_all(node, frames, bboxes, batch_size):
+    results = []
+    for start in range(0, len(frames), batch_size):
+        results.extend(node._render_frames(frames[start:start + batch_size], bboxes, inpaint_batch_size=batch_size))
+    return torch.stack(results)
+
+
+def benchmark(video_path=None, num_frames=32, batch_sizes=(4, 8, 16)):
+    node = SoraVideoWatermarkRemover()
+    print(f"=== LaMA 修复基准测试 ===")
+    print(f"使用设备: {node.device}")
+
+    frames = load_frames(video_path, num_frames)
+    if len(frames) == 0:
+        print("❌ 无法读取视频")
+        return
+    height, width = frames.shape[1:3]
+    print(f"测试帧: {len(frames)} 帧, {width}x{height}")
+    print()
+
+    print("加载LaMA模型...")
+    node.lama_model = load_lama_model(node.device)
+    node._select_inpaint_engine("lama")
+    print("✓ 模型加载完成")
+    print()
+
+    bboxes = [[width - 220, height - 80, width - 20, height - 20]]
+
+    with torch.inference_mode():
+        # 预热一次，不计入耗时
+        render_all(node, frames[:1], bboxes, 1)
+
+        start = time.time()
+        reference = render_all(node, frames, bboxes, 1)
+        loop_fps = len(frames) / (time.time() - start)
+
+        print("=" * 60)
+        print(f"{'批大小':<10} {'帧/秒':>10} {'加速':>8} {'最大像素差':>12}")
+        print("-" * 60)
+        print(f"{'1 (逐帧)':<10} {loop_fps:>10.2f} {1.0:>7.2f}x {0:>12}")
+        for batch_size in batch_sizes:
+            render_all(node, frames[:batch_size], bboxes, batch_size)
+            start = time.time()
+            output = render_all(node, frames, bboxes, batch_size)
+            fps = len(frames) / (time.time() - start)
+            max_diff = int(((output - reference).abs().max() * 255).round())
+            print(f"{batch_size:<10} {fps:>10.2f} {fps / loop_fps:>7.2f}x {max_diff:>12}")
+        print("=" * 60)
+
+    if not node.inpaint_engine.supports_batch:
+        print("⚠️  当前LaMA模型不支持批量推理，已回退为逐帧修复")
+
+
+if __name__ == "__main__":
+    video_path = Path(sys.argv[1]) if len(sys.argv) > 1 else None
+    num_frames = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    batch_sizes = [int(size) for size in sys.argv[3].split(",")] if len(sys.argv) > 3 else (4, 8, 16)
+
+    benchmark(video_path, num_frames, batch_sizes)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+检测模型标定工具 - 对比不同Florence-2模型的速度和召回率
+用法：python calibrate_detector.py <视频路径> [detection_prompt] [max_bbox_percent] [采样帧数] [模型列表]
+
+以 large 模型的检测结果为参考，统计每个模型的每帧耗时和召回率，
+帮助选择仍能找到水印的最便宜模型（即节点的 detector_model 参数）。
+"""
+import sys
+import time
+from pathlib import Path
+import cv2
+from PIL import Image
+import torch
+
+# 导入节点代码
+from nodes import detect_only, load_florence2_model, resolve_florence_model_id
+from bbox_ops import iou_matrix
+
+REFERENCE_MODEL = "large"
+MATCH_IOU = 0.5
+MIN_RECALL = 0.95
+
+
+def read_sample_frames(video_path, sample_frames):
+    """从视频中均匀抽取 sample_frames 帧"""
+    cap = cv2.VideoCapture(str(video_path))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    step = max(1, total_frames // sample_frames)
+
+    images = []
+    for frame_idx in range(0, total_frames, step)[:sample_frames]:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        ret, frame = cap.read()
+        if ret:
+            images.append((frame_idx, Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))))
+    cap.release()
+    return images
+
+
+def recall_against(reference, candidate):
+    """参考框中被候选框以 IoU >= MATCH_IOU 覆盖的比例，以及多余框数量"""
+    overlaps = iou_matrix(reference, candidate) >= MATCH_IOU
+    matched = int(overlaps.any(axis=1).sum())
+    extra = int((~overlaps.any(axis=0)).sum())
+    return matched, extra
+
+
+def calibrate(video_path, detection_prompt="watermark", max_bbox_percent=10.0, sample_frames=20,
+              models=("base", "large")):
+    print(f"=== Florence-2 检测模型标定 ===")
+    print(f"视频: {video_path}")
+    print(f"检测提示词: '{detection_prompt}'")
+    print(f"max_bbox_percent: {max_bbox_percent}")
+    print()
+
+    device = "cuda" if torch.cuda.is_available() else ("mps" if hasattr(torch.backends, 'mps') and torch.backends.mps.is_available() else "cpu")
+    print(f"使用设备: {device}")
+
+    images = read_sample_frames(video_path, sample_frames)
+    if not images:
+        print("❌ 无法读取视频")
+        return
+    print(f"采样帧数: {len(images)}")
+    print()
+
+    # 参考模型放在最前面
+    models = [REFERENCE_MODEL] + [name for name in models if name != REFERENCE_MODEL]
+
+    results = {}
+    for name in models:
+        print(f"加载 {resolve_florence_model_id(name)} ...")
+        model, processor = load_florence2_model(device, name)
+
+        # 预热一次，不计入耗时
+        detect_only(images[0][1], model, processor, device, max_bbox_percent, detection_prompt)
+
+        detections = []
+        start = time.time()
+        for _, image in images:
+            detections.append(detect_only(image, model, processor, device, max_bbox_percent, detection_prompt))
+        latency = (time.time() - start) / len(images)
+
+        results[name] = (latency, detections)
+        print(f"✓ {name}: {latency:.2f}s/帧")
+        del model, processor
+        print()
+
+    reference_latency, reference = results[REFERENCE_MODEL]
+    reference_total = sum(len(bboxes) for bboxes in reference)
+    if reference_total == 0:
+        print(f"⚠️  {REFERENCE_MODEL} 模型在采样帧中未检测到水印，无法计算召回率")
+        print("   请检查 detection_prompt 或增加采样帧数")
+
+    print("=" * 60)
+    print(f"{'模型':<40} {'耗时/帧':>8} {'召回率':>8} {'多余框':>6}")
+    print("-" * 60)
+    candidates = []
+    for name in models:
+        latency, detections = results[name]
+        matched = extra = 0
+        for ref_bboxes, bboxes in zip(reference, detections):
+            frame_matched, frame_extra = recall_against(ref_bboxes, bboxes)
+            matched += frame_matched
+            extra += frame_extra
+        recall = matched / reference_total if reference_total else 1.0
+        candidates.append((latency, name, recall))
+        print(f"{resolve_florence_model_id(name):<40} {latency:>7.2f}s {recall:>8.0%} {extra:>6}")
+    print("=" * 60)
+    print()
+
+    # 推荐最快且召回率达标的模型
+    usable = sorted(candidate for candidate in candidates if candidate[2] >= MIN_RECALL)
+    latency, name, recall = usable[0]
+    print(f"推荐: detector_model = \"{name}\"")
+    print(f"   召回率 {recall:.0%}（相对 {REFERENCE_MODEL}），每帧 {latency:.2f}s，"
+          f"比 {REFERENCE_MODEL} 快 {reference_latency / latency:.1f} 倍")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法: python calibrate_detector.py <视频路径> [detection_prompt] [max_bbox_percent] [采样帧数] [模型列表]")
+        print("示例: python calibrate_detector.py video.mp4")
+        print("示例: python calibrate_detector.py video.mp4 'Sora watermark' 10.0 30 base,large,/path/to/florence")
+        sys.exit(1)
+
+    video_path = Path(sys.argv[1])
+    detection_prompt = sys.argv[2] if len(sys.argv) > 2 else "watermark"
+    max_bbox_percent = float(sys.argv[3]) if len(sys.argv) > 3 else 10.0
+    sample_frames = int(sys.argv[4]) if len(sys.argv) > 4 else 20
+    models = sys.argv[5].split(",") if len(sys.argv) > 5 else ("base", "large")
+
+    calibrate(video_path, detection_prompt, max_bbox_percent, sample_frames, models)
@@ -0,0 +1,183 @@
+"""
+Opt-in "compiled" execution mode for the Florence-2 and LaMA models.
+
+- Florence-2: the vision tower is compiled in place with torch.compile. Its input is always
+  the processor's fixed image size, so only the batch dimension varies; batches are padded to
+  power-of-two buckets (see bucket_batch_size) so a handful of graphs cover every batch size.
+- LaMA: iopaint ships big-lama as a TorchScript module, which torch.compile cannot take, so it
+  is frozen and optimized for inference with torch.jit instead.
+
+Compiled artifacts persist under COMPILED_CACHE_DIR: a torch mega-cache archive (where
+supported), the inductor cache unless TORCHINDUCTOR_CACHE_DIR is already set, and the frozen
+LaMA module, so later runs skip code generation and re-freezing. Dynamo still traces the
+vision tower once per process. The frozen LaMA file is named after the checkpoint and iopaint
+version it was built from, so an updated model is frozen again instead of loading a stale graph.
+"""
+import hashlib
+import importlib.metadata
+import os
+from pathlib import Path
+
+import torch
+from loguru import logger
+
+COMPILED_CACHE_DIR = Path.home() / ".cache" / "jm-sora-watermark-remover" / "compiled"
+MEGA_CACHE_FILE = "torch_compile_artifacts.bin"
+
+EXECUTION_MODES = ["eager", "compiled"]
+
+
+def bucket_batch_size(batch: int) -> int:
+    """Round a batch size up to the next power of two (the compiled-graph shape buckets)."""
+    return 1 << max(0, batch - 1).bit_length()
+
+
+def enable_compile_cache():
+    """Point the inductor cache at COMPILED_CACHE_DIR and load saved compile artifacts."""
+    COMPILED_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", str(COMPILED_CACHE_DIR / "inductor"))
+    os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+
+    artifacts = COMPILED_CACHE_DIR / MEGA_CACHE_FILE
+    if artifacts.exists() and hasattr(torch.compiler, "load_cache_artifacts"):
+        try:
+            torch.compiler.load_cache_artifacts(artifacts.read_bytes())
+            logger.info(f"Loaded compiled artifacts from {artifacts}")
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable compiled artifacts {artifacts}: {e}")
+
+
+def save_compile_cache():
+    """Persist this process's compile artifacts so the next run can skip recompilation."""
+    if not hasattr(torch.compiler, "save_cache_artifacts"):
+        return
+    try:
+        saved = torch.compiler.save_cache_artifacts()
+    except Exception as e:
+        logger.warning(f"Could not save compiled artifacts: {e}")
+        return
+    if saved is not None:
+        (COMPILED_CACHE_DIR / MEGA_CACHE_FILE).write_bytes(saved[0])
+
+
+def _vision_tower(model):
+    """The Florence-2 vision encoder module, or None if the model layout is unknown."""
+    inner = getattr(model, "model", model)
+    return getattr(inner, "vision_tower", None)
+
+
+def compile_florence(model, image_size: tuple, device: str) -> bool:
+    """
+    Compile the Florence-2 vision tower in place and warm it up on a dummy batch.
+
+    Returns True if the model now runs compiled; on any failure the model is left eager.
+    """
+    if getattr(model, "execution_mode", "eager") == "compiled":
+        return True
+    tower = _vision_tower(model)
+    if tower is None:
+        logger.warning("Florence-2 vision tower not found, keeping eager execution")
+        return False
+
+    enable_compile_cache()
+    tower.eager_forward = tower.forward
+    try:
+        tower.forward = torch.compile(tower.eager_forward, dynamic=False)
+        dummy = torch.zeros((1, 3) + tuple(image_size), device=device, dtype=getattr(model, "dtype", torch.float32))
+        with torch.inference_mode():
+            model.get_image_features(dummy)
+    except Exception as e:
+        logger.warning(f"torch.compile failed for Florence-2, keeping eager execution: {e}")
+        _restore_eager_forward(tower)
+        return False
+
+    model.execution_mode = "compiled"
+    return True
+
+
+def uncompile_florence(model):
+    """Return a Florence-2 model compiled by compile_florence to eager execution."""
+    tower = _vision_tower(model)
+    if tower is not None:
+        _restore_eager_forward(tower)
+    model.execution_mode = "eager"
+
+
+def _restore_eager_forward(tower):
+    """Put back the forward method compile_florence replaced."""
+    if getattr(tower, "eager_forward", None) is not None:
+        tower.forward = tower.eager_forward
+        tower.eager_forward = None
+
+
+def _lama_source_id() -> str:
+    """Short hash identifying the big-lama checkpoint (size, mtime) and the iopaint version."""
+    checkpoint = Path(torch.hub.get_dir()) / "checkpoints" / "big-lama.pt"
+    try:
+        stat = checkpoint.stat()
+        source = [stat.st_size, stat.st_mtime_ns]
+    except OSError:
+        source = ["no-checkpoint"]
+    try:
+        source.append(importlib.metadata.version("iopaint"))
+    except importlib.metadata.PackageNotFoundError:
+        source.append("no-iopaint")
+    return hashlib.blake2b(repr(source).encode(), digest_size=8).hexdigest()
+
+
+def _frozen_lama_path(device: str) -> Path:
+    device_type = torch.device(device).type
+    return COMPILED_CACHE_DIR / (f"big-lama-frozen-{device_type}-torch{torch.__version__.split('+')[0]}"
+                                 f"-{_lama_source_id()}.pt")
+
+
+def freeze_lama(model_manager, device: str) -> bool:
+    """
+    Swap LaMA's TorchScript module for a frozen, inference-optimized copy.
+
+    The frozen module is saved to COMPILED_CACHE_DIR and loaded from there on later runs.
+    Returns True on success; on failure LaMA is left as loaded by iopaint.
+    """
+    lama = getattr(model_manager, "model", None)
+    network = getattr(lama, "model", None)
+    if network is None:
+        logger.warning("LaMA network not found, keeping eager execution")
+        return False
+    if getattr(lama, "eager_network", None) is not None:
+        return True
+
+    path = _frozen_lama_path(device)
+    try:
+        frozen = None
+        if path.exists():
+            try:
+                frozen = torch.jit.load(str(path), map_location=device)
+                logger.info(f"Loaded frozen LaMA from {path}")
+            except Exception as e:
+                logger.warning(f"Rebuilding unreadable frozen LaMA {path}: {e}")
+        if frozen is None:
+            frozen = torch.jit.freeze(network.eval())
+            COMPILED_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            # Graphs frozen from an older checkpoint or iopaint can never be loaded again
+            for stale in COMPILED_CACHE_DIR.glob(f"big-lama-frozen-{torch.device(device).type}-*.pt"):
+                stale.unlink(missing_ok=True)
+            torch.jit.save(frozen, str(path))
+            logger.info(f"Saved frozen LaMA to {path}")
+        # Inference optimizations (conv/bn folding, prepacked weights) cannot be serialized,
+        # so they are applied to the loaded frozen graph each run
+        frozen = torch.jit.optimize_for_inference(frozen)
+    except Exception as e:
+        logger.warning(f"Could not freeze LaMA, keeping eager execution: {e}")
+        return False
+
+    lama.eager_network = network
+    lama.model = frozen
+    return True
+
+
+def unfreeze_lama(model_manager):
+    """Restore the TorchScript module replaced by freeze_lama."""
+    lama = getattr(model_manager, "model", None)
+    if getattr(lama, "eager_network", None) is not None:
+        lama.model = lama.eager_network
+        lama.eager_network = None
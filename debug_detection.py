@@ -11,7 +11,7 @@ from PIL import Image, ImageDraw
 import torch
 
 # 导入节点代码
-from nodes import detect_only
+from nodes import detect_only, load_florence2_model
 
 def test_detection(file_path, detection_prompt="watermark", max_bbox_percent=10.0):
     """测试单张图片/视频帧的水印检测"""
@@ -25,12 +25,8 @@ def test_detection(file_path, detection_prompt="watermark", max_bbox_percent=10.
     device = "cuda" if torch.cuda.is_available() else ("mps" if hasattr(torch.backends, 'mps') and torch.backends.mps.is_available() else "cpu")
     print(f"使用设备: {device}")
 
-    from transformers import AutoProcessor, Florence2ForConditionalGeneration
     print("加载Florence-2模型...")
-    model = Florence2ForConditionalGeneration.from_pretrained(
-        "florence-community/Florence-2-large"
-    ).to(device).eval()
-    processor = AutoProcessor.from_pretrained("florence-community/Florence-2-large")
+    model, processor = load_florence2_model(device)
     print("✓ 模型加载完成")
     print()
 
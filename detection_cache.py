@@ -0,0 +1,116 @@
+"""
+Persistent on-disk cache of Florence-2 watermark detections.
+
+Results are keyed by a content hash of the frame plus every parameter that changes the
+detection output (prompt, max_bbox_percent, model id, enhanced flag), so re-running the
+node on the same clip after changing only inpainting settings skips the Florence-2 pass.
+Entries live in a small sqlite database with a size cap and least-recently-used eviction.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "jm-sora-watermark-remover" / "detections.sqlite"
+DEFAULT_MAX_ENTRIES = 200000
+
+
+class DetectionCache:
+    """sqlite-backed LRU cache mapping detection keys to bbox lists."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS detections ("
+            " key TEXT PRIMARY KEY,"
+            " bboxes TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS detections_last_used ON detections (last_used)")
+        self._conn.commit()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM detections").fetchone()[0]
+
+    @staticmethod
+    def frame_hash(image) -> str:
+        """Fast content hash of a frame (PIL image or uint8 numpy array)."""
+        array = np.ascontiguousarray(np.asarray(image))
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(frame_hash: str, detection_prompt, max_bbox_percent: float, model_id: str,
+                 enhanced: bool) -> str:
+        """Combine a frame hash with every detection parameter into one cache key."""
+        prompts = detection_prompt if isinstance(detection_prompt, str) else "|".join(detection_prompt)
+        params = json.dumps([prompts, round(float(max_bbox_percent), 4), model_id, bool(enhanced)])
+        return frame_hash + ":" + hashlib.blake2b(params.encode(), digest_size=8).hexdigest()
+
+    def get(self, key: str):
+        """Return the cached bbox list for key, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute("SELECT bboxes FROM detections WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE detections SET last_used = ? WHERE key = ?", (time.time(), key))
+            return json.loads(row[0])
+
+    def put(self, key: str, bboxes: list):
+        """Store a bbox list, evicting the least recently used entries above the size cap."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO detections (key, bboxes, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(bboxes), time.time()),
+            )
+            # Replaced keys are counted too; _evict() recounts before deleting anything
+            self._entries += 1
+            if self._entries > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop the oldest entries down to 90% of the size cap."""
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM detections").fetchone()[0]
+        excess = self._entries - int(self.max_entries * 0.9)
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM detections WHERE key IN "
+                "(SELECT key FROM detections ORDER BY last_used ASC LIMIT ?)",
+                (excess,),
+            )
+            self._entries -= excess
+            logger.info(f"Detection cache: evicted {excess} least recently used entries")
+
+    def reset_stats(self):
+        """Reset the hit/miss counters at the start of a run."""
+        self.hits = 0
+        self.misses = 0
+
+    def log_stats(self):
+        """Log this run's hit/miss counters and commit pending LRU updates."""
+        with self._lock:
+            self._conn.commit()
+        total = self.hits + self.misses
+        if total:
+            logger.info(f"Detection cache: {self.hits} hits, {self.misses} misses "
+                        f"({self.hits / total:.0%} hit rate, {self._entries} entries in {self.path})")
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,245 @@
+"""
+Multi-process Florence-2 detection replicas for many-core CPU hosts.
+
+generate() stops scaling after a few threads, so on large CPU nodes Pass 1 runs several
+independent Florence-2 replicas instead of one wide one. Each worker is a separate Python
+process pinned to its own subset of cores with a matching torch.set_num_threads. Keyframe
+batches are handed to whichever worker is idle, and results come back in keyframe order.
+
+Workers are started as plain subprocesses running this file (not multiprocessing "spawn",
+which would re-import ComfyUI's main module) and talk to the node over pickled messages on
+their stdin/stdout. The pool is kept at module level so it survives between node executions.
+"""
+import atexit
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+import traceback
+
+from loguru import logger
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _available_cores() -> list:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def split_cores(num_workers: int, cores: list = None) -> list:
+    """Split the usable cores into num_workers contiguous, near-equal subsets."""
+    cores = _available_cores() if cores is None else list(cores)
+    num_workers = max(1, min(num_workers, len(cores)))
+    size, extra = divmod(len(cores), num_workers)
+    subsets = []
+    start = 0
+    for i in range(num_workers):
+        end = start + size + (1 if i < extra else 0)
+        subsets.append(cores[start:end])
+        start = end
+    return subsets
+
+
+class _Worker:
+    """One detection subprocess and its message pipe."""
+
+    def __init__(self, cores: list, detector_model: str, precision: str):
+        self.cores = cores
+        threads = str(len(cores))
+        env = dict(os.environ, OMP_NUM_THREADS=threads, MKL_NUM_THREADS=threads)
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), ",".join(map(str, cores)), detector_model, precision],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env,
+        )
+
+    def send(self, message):
+        pickle.dump(message, self.process.stdin, protocol=pickle.HIGHEST_PROTOCOL)
+        self.process.stdin.flush()
+
+    def receive(self):
+        try:
+            status, payload = pickle.load(self.process.stdout)
+        except EOFError:
+            raise RuntimeError(f"Detection worker on cores {self.cores} exited "
+                               f"(exit code {self.process.poll()})") from None
+        if status == "error":
+            raise RuntimeError(f"Detection worker on cores {self.cores} failed:\n{payload}")
+        return payload
+
+    def close(self):
+        if self.process.poll() is None:
+            try:
+                self.send(("exit", None))
+                self.process.wait(timeout=10)
+            except Exception:
+                self.process.kill()
+
+
+class DetectionPool:
+    """
+    N Florence-2 replicas in separate CPU processes.
+
+    Args:
+        num_workers: Number of replicas (capped at the number of usable cores)
+        detector_model: Florence-2 alias, HuggingFace id or local path (see load_florence2_model)
+        precision: Florence-2 weight precision applied in every replica
+    """
+
+    def __init__(self, num_workers: int, detector_model: str, precision: str = "fp32"):
+        self.config = (num_workers, detector_model, precision)
+        self.closed = False
+        self.batches = 0
+        self.frames = 0
+        subsets = split_cores(num_workers)
+        logger.info(f"Starting {len(subsets)} Florence-2 detection workers "
+                    f"({', '.join(str(len(cores)) for cores in subsets)} cores each)")
+        self.workers = [_Worker(cores, detector_model, precision) for cores in subsets]
+        try:
+            # Replicas load their models in parallel; wait until all are ready
+            for worker in self.workers:
+                worker.receive()
+        except Exception:
+            self.close()
+            raise
+        logger.info("Florence-2 detection workers ready")
+
+    def detect_raw_batch(self, frames, frame_indices: list, prompts: list, batch_size: int):
+        """
+        Detect on frames[frame_indices] of an IMAGE tensor (B, H, W, C), spread over the replicas.
+
+        Each batch is gathered from the tensor only when a worker picks it up, so memory stays
+        bounded by workers x batch_size frames. Returns one raw detection list per frame index,
+        in input order.
+        """
+        import torch
+
+        batches = [frame_indices[start:start + batch_size] for start in range(0, len(frame_indices), batch_size)]
+        results = [None] * len(batches)
+        errors = []
+        jobs = queue.Queue()
+        for index in range(len(batches)):
+            jobs.put(index)
+
+        def drain(worker):
+            # One thread per replica keeps that replica busy until the job queue is empty
+            while not errors:
+                try:
+                    index = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    batch_uint8 = (frames[batches[index]] * 255).to(torch.uint8).cpu().numpy()
+                    worker.send(("detect", (prompts, batch_uint8)))
+                    results[index] = worker.receive()
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=drain, args=(worker,), daemon=True) for worker in self.workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            # A failed request can leave a worker's pipe mid-message; retire the whole pool
+            self.close()
+            raise errors[0]
+
+        self.batches += len(batches)
+        self.frames += len(frame_indices)
+        return [raw for batch_raw in results for raw in batch_raw]
+
+    def log_stats(self):
+        """Log how much work the replicas handled during this run, then reset the counters."""
+        if self.frames:
+            logger.info(f"Detection pool: {self.frames} frames in {self.batches} batches "
+                        f"across {len(self.workers)} workers")
+        self.batches = 0
+        self.frames = 0
+
+    def close(self):
+        self.closed = True
+        for worker in self.workers:
+            worker.close()
+
+
+def get_detection_pool(num_workers: int, detector_model: str, precision: str = "fp32") -> DetectionPool:
+    """Return the process-wide pool, restarting it only if its configuration changed."""
+    global _pool
+    with _pool_lock:
+        config = (num_workers, detector_model, precision)
+        if _pool is not None and (_pool.closed or _pool.config != config):
+            _pool.close()
+            _pool = None
+        if _pool is None:
+            _pool = DetectionPool(num_workers, detector_model, precision)
+        return _pool
+
+
+def shutdown_detection_pool():
+    """Stop the process-wide pool's workers."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+atexit.register(shutdown_detection_pool)
+
+
+def _worker_main(argv: list):
+    """Subprocess entry point: load one Florence-2 replica and serve detection requests."""
+    # Keep the protocol stream private; anything else printed to stdout goes to stderr
+    protocol_out = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    protocol_in = sys.stdin.buffer
+
+    def reply(status, payload):
+        pickle.dump((status, payload), protocol_out, protocol=pickle.HIGHEST_PROTOCOL)
+        protocol_out.flush()
+
+    cores = [int(core) for core in argv[0].split(",")]
+    detector_model, precision = argv[1], argv[2]
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import torch
+        import nodes
+
+        torch.set_num_threads(len(cores))
+        model, processor = nodes.load_florence2_model("cpu", detector_model)
+        if precision != "fp32":
+            model = nodes.reduce_florence_precision(model, precision)
+        sessions = {}
+    except Exception:
+        reply("error", traceback.format_exc())
+        return
+    reply("ok", None)
+
+    with torch.inference_mode():
+        while True:
+            try:
+                command, payload = pickle.load(protocol_in)
+            except EOFError:
+                return
+            if command == "exit":
+                return
+            try:
+                prompts, frames_uint8 = payload
+                key = tuple(prompts)
+                if key not in sessions:
+                    sessions[key] = nodes.FlorenceDetectionSession(model, processor, "cpu", list(prompts))
+                frames = torch.from_numpy(frames_uint8).float() / 255.0
+                reply("ok", sessions[key].detect_raw_batch(frames))
+            except Exception:
+                reply("error", traceback.format_exc())
+
+
+if __name__ == "__main__":
+    _worker_main(sys.argv[1:])
@@ -0,0 +1,305 @@
+"""
+Pass 2 inpainting engines.
+
+An engine fills the masked pixels of RGB uint8 crops cut from the video frames and returns RGB
+uint8 crops; only their masked pixels are used. Each engine declares what the node's crop
+scheduler may rely on:
+
+- supports_batch: inpaint_batch() runs several crops per forward pass
+- preferred_dtype: torch dtype the engine computes in (torch.uint8 for engines that work on
+  the uint8 crops as they are); the scheduler accounts crop memory with it
+- device: where it runs, from the device option unless cpu_only
+- cpu_only: the engine runs on the CPU whatever device the node uses
+- max_crop_size: largest crop side inpaint_batch() accepts; larger crops go one at a time
+- uses_context: the fill depends on the pixels around the mask (so crops keep an inpainting
+  context margin and temporal reuse / flow propagation apply)
+- needs_lama: the node must load the LaMA model
+
+Engines register under a name with register_inpaint_engine and are built by
+create_inpaint_engine, so new engines (ONNX, quantized, cached, ...) plug in without touching
+the node.
+"""
+import abc
+
+import cv2
+import numpy as np
+import torch
+
+try:
+    from cv2.typing import MatLike
+except ImportError:
+    MatLike = np.ndarray
+
+# iopaint switches to its own crop strategy above this image side; LaMA pads inputs to a multiple of 8
+LAMA_HD_TRIGGER_SIZE = 800
+LAMA_PAD_MODULO = 8
+# Neighbourhood radius of OpenCV's classical inpainting
+CLASSICAL_INPAINT_RADIUS = 5
+# Smear weights a fill direction down by its endpoint difference (0-1) times this, so it runs along edges
+SMEAR_EDGE_SENSITIVITY = 20.0
+
+
+def process_image_with_lama(image: MatLike, mask: MatLike, model_manager, quality_mode="balanced"):
+    """Process image with LaMA inpainting model.
+
+    Args:
+        image: Input image
+        mask: Mask indicating regions to inpaint
+        model_manager: LaMA model manager
+        quality_mode: Quality/speed tradeoff
+            - "fast": ldm_steps=30, faster but lower quality
+            - "balanced": ldm_steps=50, good balance (default)
+            - "high": ldm_steps=100, slower but better quality
+    """
+    # Lazy import to avoid dependency conflicts
+    from iopaint.schema import HDStrategy, LDMSampler, InpaintRequest as Config
+
+    # Quality presets
+    steps_map = {
+        "fast": 30,
+        "balanced": 50,
+        "high": 100,
+    }
+
+    ldm_steps = steps_map.get(quality_mode, 50)
+
+    config = Config(
+        ldm_steps=ldm_steps,
+        ldm_sampler=LDMSampler.ddim,
+        hd_strategy=HDStrategy.CROP,
+        hd_strategy_crop_margin=128,  # Increased from 64 for better context
+        hd_strategy_crop_trigger_size=LAMA_HD_TRIGGER_SIZE,
+        hd_strategy_resize_limit=1600,
+    )
+    result = model_manager(image, mask, config)
+
+    if result.dtype in [np.float64, np.float32]:
+        result = np.clip(result, 0, 255).astype(np.uint8)
+
+    return result
+
+
+def _smear_rows(image: np.ndarray, hole: np.ndarray):
+    """(fill, weight) interpolating every hole pixel between the nearest valid pixels of its row."""
+    height, width = hole.shape
+    index = np.broadcast_to(np.arange(width), hole.shape)
+    before = np.maximum.accumulate(np.where(hole, -1, index), axis=1)
+    after = np.minimum.accumulate(np.where(hole, width, index)[:, ::-1], axis=1)[:, ::-1]
+    has_before, has_after = before >= 0, after < width
+    rows = np.arange(height)[:, None]
+    first = image[rows, np.clip(before, 0, width - 1)].astype(np.float32)
+    last = image[rows, np.clip(after, 0, width - 1)].astype(np.float32)
+    first = np.where(has_before[:, :, None], first, last)
+    last = np.where(has_after[:, :, None], last, first)
+
+    # A hole touching the crop border extends its only side, weighted as if mirrored across the border
+    span = np.where(has_before & has_after, after - before,
+                    np.where(has_before, 2 * (index - before), 2 * (after - index)))
+    step = (index - before) / np.maximum(after - before, 1)
+    fill = first + (last - first) * np.where(has_before & has_after, step, 0.0)[:, :, None]
+    edge = np.abs(last - first).mean(axis=2) / 255
+    weight = np.where(has_before | has_after, 1 / (np.maximum(span, 1) * (1 + SMEAR_EDGE_SENSITIVITY * edge)), 0.0)
+    return fill, weight
+
+
+def smear_inpaint(image: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    Fill the mask pixels of an (H, W, 3) uint8 image by smearing in the pixels around them.
+
+    Each hole pixel is interpolated linearly between the nearest unmasked pixels of its row and
+    of its column. The two fills are blended by weights favouring the shorter span and the
+    direction whose two endpoints agree, so the fill follows edges instead of crossing them.
+    """
+    result = image.copy()
+    rows, columns = np.nonzero(mask)
+    if len(rows) == 0:
+        return result
+    # The nearest valid pixels all lie within one pixel of the hole's bounding box
+    y1, x1 = max(rows.min() - 1, 0), max(columns.min() - 1, 0)
+    y2, x2 = rows.max() + 2, columns.max() + 2
+    image, hole = image[y1:y2, x1:x2], mask[y1:y2, x1:x2] > 0
+
+    row_fill, row_weight = _smear_rows(image, hole)
+    column_fill, column_weight = _smear_rows(image.transpose(1, 0, 2), hole.T)
+    column_fill, column_weight = column_fill.transpose(1, 0, 2), column_weight.T
+
+    total = row_weight + column_weight
+    blended = (row_fill * row_weight[:, :, None] + column_fill * column_weight[:, :, None]) / np.maximum(total, 1e-12)[:, :, None]
+    fillable = hole & (total > 0)
+    result[y1:y2, x1:x2][fillable] = np.clip(np.round(blended[fillable]), 0, 255).astype(np.uint8)
+    return result
+
+
+def lama_network(model_manager):
+    """(network, device) of the LaMA model inside an iopaint ModelManager, or (None, None)."""
+    lama = getattr(model_manager, "model", None)
+    return getattr(lama, "model", None), getattr(lama, "device", None)
+
+
+def _pad_to_modulo(image: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Symmetric-pad an (H, W, C) array to (height, width), as iopaint pads LaMA inputs."""
+    return np.pad(image, ((0, height - image.shape[0]), (0, width - image.shape[1]), (0, 0)), mode="symmetric")
+
+
+def inpaint_crops_batched(crops: list, masks: list, model_manager, batch_size: int, dtype=torch.float32,
+                          device=None) -> list:
+    """
+    Inpaint many RGB uint8 crops with LaMA, up to batch_size crops per forward pass.
+
+    Crops are bucketed by their padded shape (each side rounded up to LAMA_PAD_MODULO), so every
+    batch has a single tensor shape, and fed to the LaMA network with the same scaling, mask
+    binarization and padding iopaint applies to a single image. Returns RGB uint8 results in
+    input order; like iopaint's output, only their masked pixels are meant to be used.
+    """
+    network, network_device = lama_network(model_manager)
+    device = network_device if device is None else device
+    buckets = {}
+    for index, crop in enumerate(crops):
+        height, width = crop.shape[:2]
+        padded = (-(-height // LAMA_PAD_MODULO) * LAMA_PAD_MODULO, -(-width // LAMA_PAD_MODULO) * LAMA_PAD_MODULO)
+        buckets.setdefault(padded, []).append(index)
+
+    results = [None] * len(crops)
+    for (padded_height, padded_width), indices in buckets.items():
+        for start in range(0, len(indices), batch_size):
+            chunk = indices[start:start + batch_size]
+            images = np.stack([_pad_to_modulo(crops[i], padded_height, padded_width) for i in chunk])
+            chunk_masks = np.stack([_pad_to_modulo(masks[i][:, :, None], padded_height, padded_width) for i in chunk])
+            image_batch = torch.from_numpy(images).to(device).permute(0, 3, 1, 2).to(dtype) / 255
+            mask_batch = (torch.from_numpy(chunk_masks).to(device).permute(0, 3, 1, 2) > 0).to(dtype)
+
+            output = network(image_batch, mask_batch)
+            output = (output.permute(0, 2, 3, 1) * 255).clamp(0, 255).to(torch.uint8).cpu().numpy()
+            for i, result in zip(chunk, output):
+                height, width = crops[i].shape[:2]
+                results[i] = result[:height, :width]
+    return results
+
+
+INPAINT_ENGINES = {}  # name -> InpaintEngine subclass, in registration order
+
+
+def register_inpaint_engine(engine_class):
+    """Class decorator adding an InpaintEngine subclass to INPAINT_ENGINES under its name."""
+    INPAINT_ENGINES[engine_class.name] = engine_class
+    return engine_class
+
+
+def create_inpaint_engine(name: str, **options):
+    """
+    Build a registered engine.
+
+    options are the node's context (model_manager, quality_mode, device); every engine takes
+    what it needs and ignores the rest.
+    """
+    if name not in INPAINT_ENGINES:
+        raise ValueError(f"Unknown inpainting engine {name!r}, expected one of {list(INPAINT_ENGINES)}")
+    return INPAINT_ENGINES[name](**options)
+
+
+class InpaintEngine(abc.ABC):
+    """Fills the masked pixels of RGB uint8 crops (see the module docstring for the attributes)."""
+
+    name = None
+    supports_batch = False
+    preferred_dtype = torch.uint8
+    device = "cpu"
+    cpu_only = False
+    max_crop_size = None
+    uses_context = True
+    needs_lama = False
+
+    def __init__(self, device="cpu", **options):
+        if not self.cpu_only:
+            self.device = str(device)
+
+    @abc.abstractmethod
+    def inpaint(self, crop: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """Fill one (H, W, 3) RGB uint8 crop where its (H, W) uint8 mask is non-zero."""
+
+    def inpaint_batch(self, crops: list, masks: list, batch_size: int) -> list:
+        """Fill many crops, up to batch_size per forward pass; engines without batching loop."""
+        return [self.inpaint(crop, mask) for crop, mask in zip(crops, masks)]
+
+    def accepts_batch(self, crop: np.ndarray) -> bool:
+        """Whether crop may go through inpaint_batch() with other crops."""
+        return self.supports_batch and (self.max_crop_size is None or max(crop.shape[:2]) <= self.max_crop_size)
+
+
+@register_inpaint_engine
+class LamaEngine(InpaintEngine):
+    """
+    big-lama through iopaint.
+
+    Single crops take iopaint's own path (HD crop strategy, quality_mode presets). Batches go
+    straight to the LaMA network with iopaint's preprocessing, which only matches iopaint up to
+    LAMA_HD_TRIGGER_SIZE.
+    """
+
+    name = "lama"
+    preferred_dtype = torch.float32
+    max_crop_size = LAMA_HD_TRIGGER_SIZE
+    needs_lama = True
+
+    def __init__(self, model_manager=None, quality_mode="balanced", **options):
+        super().__init__(**options)
+        self.model_manager = model_manager
+        self.quality_mode = quality_mode
+        network, device = lama_network(model_manager)
+        # Exports without a reachable network can still inpaint one crop at a time through iopaint
+        self.supports_batch = network is not None
+        if device is not None:
+            # The weights were loaded for the node's device; the network's own placement wins
+            self.device = str(device)
+
+    def inpaint(self, crop, mask):
+        result = process_image_with_lama(crop, mask, self.model_manager, quality_mode=self.quality_mode)
+        return cv2.cvtColor(result, cv2.COLOR_BGR2RGB)
+
+    def inpaint_batch(self, crops, masks, batch_size):
+        return inpaint_crops_batched(crops, masks, self.model_manager, batch_size, self.preferred_dtype, self.device)
+
+
+@register_inpaint_engine
+class TeleaEngine(InpaintEngine):
+    """OpenCV's fast marching inpainting (Telea)."""
+
+    name = "telea"
+    cpu_only = True
+    flag = cv2.INPAINT_TELEA
+
+    def inpaint(self, crop, mask):
+        return cv2.inpaint(crop, mask, CLASSICAL_INPAINT_RADIUS, self.flag)
+
+
+@register_inpaint_engine
+class NavierStokesEngine(TeleaEngine):
+    """OpenCV's Navier-Stokes based inpainting."""
+
+    name = "navier_stokes"
+    flag = cv2.INPAINT_NS
+
+
+@register_inpaint_engine
+class SmearEngine(InpaintEngine):
+    """Edge-aware row/column interpolation (see smear_inpaint)."""
+
+    name = "smear"
+    cpu_only = True
+
+    def inpaint(self, crop, mask):
+        return smear_inpaint(crop, mask)
+
+
+@register_inpaint_engine
+class TransparentEngine(InpaintEngine):
+    """Flattens the masked pixels onto a white background, as the node's transparent mode."""
+
+    name = "transparent"
+    cpu_only = True
+    uses_context = False
+
+    def inpaint(self, crop, mask):
+        result = crop.copy()
+        result[mask > 0] = 255
+        return result
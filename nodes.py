@@ -2,6 +2,11 @@ import torch
 import numpy as np
 from PIL import Image, ImageDraw
 import cv2
+import copy
+import functools
+import queue
+import threading
+import time
 from enum import Enum
 
 # Monkey-patch: cached_download was removed in huggingface_hub 0.24, add compatibility shim
@@ -15,6 +20,47 @@ if not hasattr(huggingface_hub, 'cached_download'):
 # from iopaint.schema import HDStrategy, LDMSampler, InpaintRequest as Config
 from loguru import logger
 
+try:
+    from .detection_cache import DetectionCache
+except ImportError:
+    # Diagnostic scripts import nodes.py as a top-level module
+    from detection_cache import DetectionCache
+
+try:
+    from .bbox_ops import (
+        area_percent, as_boxes, context_windows, greedy_match, iou_matrix, nms, pad_and_clip, union_merge,
+    )
+except ImportError:
+    from bbox_ops import (
+        area_percent, as_boxes, context_windows, greedy_match, iou_matrix, nms, pad_and_clip, union_merge,
+    )
+
+try:
+    from .timeline import MaskTimeline
+except ImportError:
+    from timeline import MaskTimeline
+
+try:
+    from .detection_pool import get_detection_pool
+except ImportError:
+    from detection_pool import get_detection_pool
+
+try:
+    from .compiled_execution import (
+        EXECUTION_MODES, bucket_batch_size, compile_florence, freeze_lama, save_compile_cache,
+        uncompile_florence, unfreeze_lama,
+    )
+except ImportError:
+    from compiled_execution import (
+        EXECUTION_MODES, bucket_batch_size, compile_florence, freeze_lama, save_compile_cache,
+        uncompile_florence, unfreeze_lama,
+    )
+
+try:
+    from .inpaint_engines import INPAINT_ENGINES, create_inpaint_engine, process_image_with_lama  # noqa: F401
+except ImportError:
+    from inpaint_engines import INPAINT_ENGINES, create_inpaint_engine, process_image_with_lama  # noqa: F401
+
 try:
     from cv2.typing import MatLike
 except ImportError:
@@ -25,6 +71,98 @@ class TaskType(str, Enum):
     OPEN_VOCAB_DETECTION = "<OPEN_VOCABULARY_DETECTION>"
 
 
+# Number of frames sent through one Florence-2 generate() call during Pass 1
+DEFAULT_DETECTION_BATCH_SIZE = 4
+
+# max_bbox_percent multipliers tried by enhanced detection
+ENHANCED_THRESHOLD_SCALES = (1.0, 1.5, 2.0)
+
+# Florence-2 decoding limits for open-vocabulary detection. An OVD answer is a few tokens
+# per box, so detection sessions calibrate a much tighter budget than the generic limit.
+DETECTION_MAX_NEW_TOKENS = 1024
+DETECTION_MIN_DECODE_BUDGET = 64
+
+# ROI re-detection: windows around known watermark positions are grown by this fraction of
+# the box size plus a fixed margin, and never smaller than the minimum window side
+ROI_MARGIN_SCALE = 1.0
+ROI_MARGIN_PIXELS = 64
+ROI_MIN_WINDOW = 384
+# Use a full-frame detection instead when the ROI windows cover more than this share of the frame
+ROI_MAX_COVERAGE = 0.5
+# Every Nth detection batch runs on the full frame to pick up watermarks at new positions
+ROI_FULL_FRAME_INTERVAL = 10
+
+# Florence-2 checkpoints selectable by alias; any other value is used as a HuggingFace id or local path
+FLORENCE_MODELS = {
+    "base": "florence-community/Florence-2-base",
+    "large": "florence-community/Florence-2-large",
+}
+DEFAULT_DETECTOR_MODEL = "large"
+
+# Florence-2 weight precision options. Reduced precision must reproduce the fp32 boxes on
+# PRECISION_CALIBRATION_FRAMES frames of the clip with at least PRECISION_MIN_IOU mean IoU.
+FLORENCE_PRECISIONS = ["fp32", "bf16", "int8"]
+PRECISION_CALIBRATION_FRAMES = 4
+PRECISION_MIN_IOU = 0.9
+
+# Pass 2 inpaints only windows around the padded bboxes, with this much context on each side
+# (the margin iopaint's own crop strategy uses)
+INPAINT_CROP_MARGIN = 128
+# Pass 2 fill backends (see inpaint_engines.py); transparency is selected by the transparent input
+INPAINT_BACKENDS = [name for name in INPAINT_ENGINES if name != "transparent"]
+# Temporal inpaint reuse compares a ring of this many context pixels around each mask
+INPAINT_REUSE_RING = 8
+# Flow propagation ignores the motion this close to a mask (Farneback's 15 px window sees the
+# watermark there) and fills it by normalized convolution of the surrounding flow at this sigma
+FLOW_MASK_DILATION = 8
+FLOW_FILL_SIGMA = 24.0
+# Flow is estimated at this fraction of the window resolution and upsampled; background motion
+# inside a context window is smooth, and Farneback cost drops with the pixel count
+FLOW_SCALE = 0.5
+
+# Pass 1 keyframe scheduling modes
+DETECTION_SCHEDULES = ["uniform", "motion", "bisect", "track"]
+# Schedules whose keyframes are known before detection starts, so Pass 2 can stream behind Pass 1
+PIPELINE_SCHEDULES = ("uniform", "motion")
+# Detected keyframe batches buffered between the detection thread and inpainting
+PIPELINE_QUEUE_DEPTH = 4
+
+# Motion/scene-cut gated scheduling: frames are analysed at about this many pixels on the long side
+MOTION_ANALYSIS_SIZE = 64
+MOTION_HISTOGRAM_BINS = 32
+# Half L1 distance between consecutive gray histograms (0-1) above which a frame is a scene cut
+SCENE_CUT_THRESHOLD = 0.4
+# The frame is split into a MOTION_TILE_GRID x MOTION_TILE_GRID grid; the outer
+# WATERMARK_BAND_TILES rings of tiles are the bands where Sora places its watermark. A frame whose
+# mean absolute gray change (0-1) in any band tile since the last keyframe exceeds the threshold
+# gets a new keyframe.
+MOTION_TILE_GRID = 8
+WATERMARK_BAND_TILES = 2
+BAND_CHANGE_THRESHOLD = 0.05
+# Unchanged spans still get a keyframe at least this often
+MOTION_MAX_GAP_SECONDS = 2.0
+
+# Adaptive bisection scheduling: coarse keyframe spacing, and the IoU at which two keyframes'
+# boxes count as the same watermark position
+BISECT_COARSE_SECONDS = 1.0
+BISECT_MATCH_IOU = 0.5
+
+# Template tracking between Florence-2 keyframes: normalized cross-correlation score needed to
+# trust a match, search window margin around the last position, and forced re-detection interval
+TRACK_MATCH_THRESHOLD = 0.8
+TRACK_SEARCH_MARGIN = 16
+TRACK_REFRESH_SECONDS = 2.0
+
+# Temporal bbox stabilization after Pass 1: jittering detections of one watermark are clustered
+# into track segments (IoU with the segment's first box) that share one canonical box
+BBOX_STABILIZATION_MODES = ["off", "median", "envelope"]
+STABILIZE_MATCH_IOU = 0.5
+
+# How keyframe boxes fill the frames up to the next keyframe: held unchanged, or linearly
+# interpolated towards the matching box of the next keyframe (see MaskTimeline)
+BBOX_INTERPOLATION_MODES = ["hold", "linear"]
+
+
 def download_lama_model():
     """Download LaMA model from GitHub (same as reference project)."""
     from pathlib import Path
@@ -60,6 +198,22 @@ def download_lama_model():
         return False
 
 
+def resolve_florence_model_id(detector_model: str) -> str:
+    """Map a detector_model alias ("base"/"large") to its checkpoint; other values pass through."""
+    detector_model = (detector_model or DEFAULT_DETECTOR_MODEL).strip()
+    return FLORENCE_MODELS.get(detector_model.lower(), detector_model)
+
+
+def load_florence2_model(device, detector_model: str = DEFAULT_DETECTOR_MODEL):
+    """Load a Florence-2 model and processor by alias, HuggingFace id or local path."""
+    from transformers import AutoProcessor, Florence2ForConditionalGeneration
+
+    model_id = resolve_florence_model_id(detector_model)
+    model = Florence2ForConditionalGeneration.from_pretrained(model_id).to(device).eval()
+    processor = AutoProcessor.from_pretrained(model_id)
+    return model, processor
+
+
 def load_lama_model(device):
     """Load LaMA model, downloading if necessary."""
     # Monkey-patch to bypass peft version check in iopaint
@@ -160,8 +314,8 @@ def identify(task_prompt: TaskType, image: MatLike, text_input: str, model, proc
 
     generated_ids = model.generate(
         input_ids=inputs["input_ids"],
-        pixel_values=inputs["pixel_values"],
-        max_new_tokens=1024,
+        pixel_values=inputs["pixel_values"].to(_model_dtype(model)),
+        max_new_tokens=DETECTION_MAX_NEW_TOKENS,
         do_sample=False,
         num_beams=1,
     )
@@ -171,162 +325,736 @@ def identify(task_prompt: TaskType, image: MatLike, text_input: str, model, proc
     )
 
 
+def identify_batch(task_prompt: TaskType, images: list, text_input: str, model, processor, device: str):
+    """Identify objects on several images with a single batched Florence-2 generate() call.
+
+    Returns one parsed answer per image, in the same order as `images`.
+    """
+    if not isinstance(task_prompt, TaskType):
+        raise ValueError(f"task_prompt must be a TaskType, but {task_prompt} is of type {type(task_prompt)}")
+    if not images:
+        return []
+
+    prompt = task_prompt.value if text_input is None else task_prompt.value + text_input
+    # Every image gets the same prompt, so the token sequences already share one length;
+    # padding only matters if a processor ever emits different lengths.
+    inputs = processor(text=[prompt] * len(images), images=images, return_tensors="pt", padding=True)
+    inputs = {k: v.to(device) for k, v in inputs.items()}
+
+    generated_ids = model.generate(
+        input_ids=inputs["input_ids"],
+        pixel_values=inputs["pixel_values"].to(_model_dtype(model)),
+        max_new_tokens=DETECTION_MAX_NEW_TOKENS,
+        do_sample=False,
+        num_beams=1,
+    )
+    generated_texts = processor.batch_decode(generated_ids, skip_special_tokens=False)
+    return [
+        processor.post_process_generation(text, task=task_prompt.value, image_size=(image.width, image.height))
+        for text, image in zip(generated_texts, images)
+    ]
+
+
+def identify_multi_prompt_batch(task_prompt: TaskType, images: list, text_inputs: list, model, processor, device: str):
+    """Identify objects on a batch of images for several text prompts.
+
+    The images go through the Florence-2 vision encoder once; the image features are
+    reused for every prompt's encoder/decoder run. Returns, per image, one parsed answer per prompt.
+    """
+    if not isinstance(task_prompt, TaskType):
+        raise ValueError(f"task_prompt must be a TaskType, but {task_prompt} is of type {type(task_prompt)}")
+    if not images:
+        return []
+
+    image_token_id = getattr(processor, "image_token_id", None)
+    if image_token_id is None:
+        image_token_id = getattr(model.config, "image_token_id", None)
+    if not hasattr(model, "get_image_features") or image_token_id is None:
+        # Model does not expose its vision encoder separately - run each prompt end to end
+        per_prompt = [identify_batch(task_prompt, images, text, model, processor, device) for text in text_inputs]
+        return [list(answers) for answers in zip(*per_prompt)]
+
+    prompts = [task_prompt.value if text is None else task_prompt.value + text for text in text_inputs]
+    inputs = processor(text=[prompts[0]] * len(images), images=images, return_tensors="pt", padding=True)
+    pixel_values = inputs["pixel_values"].to(device)
+    image_features = _encode_images(model, pixel_values)
+
+    answers = [[] for _ in images]
+    for prompt_idx, prompt in enumerate(prompts):
+        if prompt_idx == 0:
+            input_ids, attention_mask = inputs["input_ids"], inputs["attention_mask"]
+        else:
+            # Token ids do not depend on image content, so one image is enough to lay out the prompt
+            prompt_inputs = processor(text=[prompt], images=images[:1], return_tensors="pt")
+            input_ids = prompt_inputs["input_ids"].repeat(len(images), 1)
+            attention_mask = prompt_inputs["attention_mask"].repeat(len(images), 1)
+
+        generated_ids = _generate_from_image_features(
+            model, input_ids.to(device), attention_mask.to(device), image_features, image_token_id
+        )
+        generated_texts = processor.batch_decode(generated_ids, skip_special_tokens=False)
+        for image_idx, (text, image) in enumerate(zip(generated_texts, images)):
+            answers[image_idx].append(processor.post_process_generation(
+                text, task=task_prompt.value, image_size=(image.width, image.height)
+            ))
+
+    return answers
+
+
+@torch.no_grad()
+def _encode_images(model, pixel_values):
+    """Run the Florence-2 vision encoder + projector and return the image token features."""
+    batch = pixel_values.shape[0]
+    if getattr(model, "execution_mode", "eager") == "compiled" and bucket_batch_size(batch) != batch:
+        # Pad to the compiled shape bucket so odd batch sizes reuse an existing graph
+        padding = pixel_values[-1:].expand(bucket_batch_size(batch) - batch, -1, -1, -1)
+        pixel_values = torch.cat([pixel_values, padding])
+    image_features = model.get_image_features(pixel_values.to(_model_dtype(model)))
+    # Newer transformers return a model output with the projected features in pooler_output
+    if hasattr(image_features, "pooler_output"):
+        image_features = image_features.pooler_output
+    return image_features[:batch]
+
+
+@torch.no_grad()
+def _generate_from_image_features(model, input_ids, attention_mask, image_features, image_token_id: int,
+                                  max_new_tokens: int = DETECTION_MAX_NEW_TOKENS, prompt_embeds=None):
+    """Greedy-decode Florence-2 from precomputed image features instead of pixel values.
+
+    `prompt_embeds` may hold the already-embedded `input_ids` (e.g. cached by a detection session).
+    """
+    inputs_embeds = model.get_input_embeddings()(input_ids) if prompt_embeds is None else prompt_embeds.clone()
+    image_mask = (input_ids == image_token_id).unsqueeze(-1).expand_as(inputs_embeds)
+    inputs_embeds = inputs_embeds.masked_scatter(image_mask, image_features.to(inputs_embeds.dtype))
+    encoder_outputs = model.get_encoder()(inputs_embeds=inputs_embeds, attention_mask=attention_mask)
+
+    return model.generate(
+        encoder_outputs=encoder_outputs,
+        attention_mask=attention_mask,
+        max_new_tokens=max_new_tokens,
+        do_sample=False,
+        num_beams=1,
+    )
+
+
+def parse_detection_prompts(detection_prompt):
+    """
+    Normalize a detection prompt into a list of prompts.
+
+    Accepts a list of strings or a single string with prompts separated by "|",
+    e.g. "watermark | Sora watermark | logo".
+    """
+    if isinstance(detection_prompt, str):
+        detection_prompt = detection_prompt.split("|")
+    prompts = [prompt.strip() for prompt in detection_prompt if prompt and prompt.strip()]
+    return prompts or ["watermark"]
+
+
 def get_watermark_mask(image: MatLike, model, processor, device: str, max_bbox_percent: float, detection_prompt: str = "watermark", bbox_padding: int = 10):
     """Detect watermarks and create a mask for inpainting."""
     task_prompt = TaskType.OPEN_VOCAB_DETECTION
     parsed_answer = identify(task_prompt, image, detection_prompt, model, processor, device)
 
-    mask = Image.new("L", image.size, 0)
-    draw = ImageDraw.Draw(mask)
+    raw_detections = _raw_detections_from_answer(parsed_answer, image.size)
+    for bbox, percent in raw_detections:
+        if percent > max_bbox_percent:
+            logger.warning(f"Skipping large bounding box: {bbox} covering {percent / 100:.2%} of the image")
+
+    return bbox_mask(image.size, filter_raw_detections(raw_detections, max_bbox_percent), bbox_padding)
 
-    detection_key = "<OPEN_VOCABULARY_DETECTION>"
-    if detection_key in parsed_answer and "bboxes" in parsed_answer[detection_key]:
-        image_area = image.width * image.height
-        for bbox in parsed_answer[detection_key]["bboxes"]:
-            x1, y1, x2, y2 = map(int, bbox)
-            bbox_area = (x2 - x1) * (y2 - y1)
-            if (bbox_area / image_area) * 100 <= max_bbox_percent:
-                # Apply padding to ensure full watermark coverage
-                x1 = max(0, x1 - bbox_padding)
-                y1 = max(0, y1 - bbox_padding)
-                x2 = min(image.width, x2 + bbox_padding)
-                y2 = min(image.height, y2 + bbox_padding)
-                draw.rectangle([x1, y1, x2, y2], fill=255)
-            else:
-                logger.warning(f"Skipping large bounding box: {bbox} covering {bbox_area / image_area:.2%} of the image")
 
+def bbox_mask(image_size: tuple, bboxes: list, bbox_padding: int = 0):
+    """Inpainting mask (PIL "L") of a (width, height) image with the padded bboxes filled."""
+    mask = Image.new("L", image_size, 0)
+    draw = ImageDraw.Draw(mask)
+    # Apply padding to ensure full watermark coverage
+    for bbox in pad_and_clip(bboxes, bbox_padding, image_size).tolist():
+        draw.rectangle(bbox, fill=255)
     return mask
 
 
-def detect_only(image: MatLike, model, processor, device: str, max_bbox_percent: float, detection_prompt: str = "watermark"):
+def detect_only(image: MatLike, model, processor, device: str, max_bbox_percent: float, detection_prompt: str = "watermark",
+                cache: DetectionCache = None):
     """
     Detect watermarks and return bounding boxes WITHOUT creating mask or inpainting.
     Used for sparse detection in video processing.
+
+    If a DetectionCache is given, it is consulted before running the model.
+    """
+    if cache is not None:
+        key = cache.make_key(
+            cache.frame_hash(image), parse_detection_prompts(detection_prompt), max_bbox_percent, _model_id(model), False
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    raw_detections = detect_raw(image, model, processor, device, detection_prompt)
+    bboxes = filter_raw_detections(raw_detections, max_bbox_percent)
+
+    if cache is not None:
+        cache.put(key, bboxes)
+    return bboxes
+
+
+def detect_only_batch(images: list, model, processor, device: str, max_bbox_percent: float,
+                      detection_prompt: str = "watermark", batch_size: int = DEFAULT_DETECTION_BATCH_SIZE):
+    """
+    Batched version of detect_only: runs Florence-2 on up to `batch_size` images per generate() call.
+    Returns one bbox list per image, in the same order as `images`.
+    """
+    raw_batch = detect_raw_batch(images, model, processor, device, detection_prompt, batch_size)
+    return [filter_raw_detections(raw_detections, max_bbox_percent) for raw_detections in raw_batch]
+
+
+def detect_raw(image: MatLike, model, processor, device: str, detection_prompt="watermark"):
+    """
+    Run Florence-2 once and return every detected bbox with its area percent, unfiltered.
+
+    Args:
+        detection_prompt: A prompt string or a list of prompts (see parse_detection_prompts)
+
+    Returns:
+        List of ([x1, y1, x2, y2], area_percent) tuples
     """
+    prompts = parse_detection_prompts(detection_prompt)
+    if len(prompts) > 1:
+        return detect_raw_batch([image], model, processor, device, prompts)[0]
+
     task_prompt = TaskType.OPEN_VOCAB_DETECTION
-    parsed_answer = identify(task_prompt, image, detection_prompt, model, processor, device)
+    parsed_answer = identify(task_prompt, image, prompts[0], model, processor, device)
+    return _raw_detections_from_answer(parsed_answer, image.size)
+
+
+def detect_raw_batch(images: list, model, processor, device: str, detection_prompt="watermark",
+                     batch_size: int = DEFAULT_DETECTION_BATCH_SIZE):
+    """
+    Batched version of detect_raw. Returns one raw detection list per image.
+
+    With several prompts the vision encoder runs once per image and the detections of
+    all prompts are merged into one set (see _merge_prompt_detections).
+    """
+    task_prompt = TaskType.OPEN_VOCAB_DETECTION
+    prompts = parse_detection_prompts(detection_prompt)
+    batch_size = max(1, int(batch_size))
 
     results = []
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        if len(prompts) == 1:
+            parsed_answers = identify_batch(task_prompt, chunk, prompts[0], model, processor, device)
+            for parsed_answer, image in zip(parsed_answers, chunk):
+                results.append(_raw_detections_from_answer(parsed_answer, image.size))
+        else:
+            multi_answers = identify_multi_prompt_batch(task_prompt, chunk, prompts, model, processor, device)
+            for prompt_answers, image in zip(multi_answers, chunk):
+                results.append(_merge_prompt_detections(
+                    [_raw_detections_from_answer(parsed_answer, image.size) for parsed_answer in prompt_answers]
+                ))
+
+    return results
+
+
+def _merge_prompt_detections(per_prompt_raw: list, iou_threshold: float = 0.5):
+    """
+    Union the raw detections of several prompts, dropping boxes that duplicate a smaller box.
+
+    Suppression runs from the smallest box up (earlier prompts first on ties), so a box only
+    ever suppresses larger ones. Oversized boxes therefore cannot remove a box that passes
+    max_bbox_percent, and area filtering the merged list keeps the same boxes as filtering
+    each prompt's detections before merging. Kept detections stay in prompt order.
+    """
+    if len(per_prompt_raw) == 1:
+        return per_prompt_raw[0]
+
+    merged = [detection for raw_detections in per_prompt_raw for detection in raw_detections]
+    if not merged:
+        return []
+    order = np.argsort([percent for _, percent in merged], kind="stable")
+    kept = order[nms([merged[i][0] for i in order], iou_threshold)]
+    return [merged[i] for i in sorted(kept.tolist())]
+
+
+def _raw_detections_from_answer(parsed_answer: dict, image_size: tuple):
+    """Convert a parsed OVD answer for a (width, height) image into ([x1, y1, x2, y2], area_percent) tuples."""
     detection_key = "<OPEN_VOCABULARY_DETECTION>"
+    if detection_key not in parsed_answer or "bboxes" not in parsed_answer[detection_key]:
+        return []
 
-    if detection_key in parsed_answer and "bboxes" in parsed_answer[detection_key]:
-        image_area = image.width * image.height
-        for bbox in parsed_answer[detection_key]["bboxes"]:
-            x1, y1, x2, y2 = map(int, bbox)
-            bbox_area = (x2 - x1) * (y2 - y1)
-            area_percent = (bbox_area / image_area) * 100
-            accepted = area_percent <= max_bbox_percent
+    boxes = as_boxes(parsed_answer[detection_key]["bboxes"])
+    return list(zip(boxes.tolist(), area_percent(boxes, image_size).tolist()))
 
-            if accepted:
-                results.append([x1, y1, x2, y2])
 
-    return results
+def filter_raw_detections(raw_detections: list, max_bbox_percent: float):
+    """Keep the raw detections covering at most max_bbox_percent of the image."""
+    if not raw_detections:
+        return []
+    bboxes, percents = zip(*raw_detections)
+    return as_boxes(bboxes)[np.asarray(percents) <= max_bbox_percent].tolist()
+
+
+def enhanced_filter_raw_detections(raw_detections: list, max_bbox_percent: float,
+                                   threshold_scales=ENHANCED_THRESHOLD_SCALES):
+    """
+    Apply several area thresholds to one set of raw detections and merge the results.
+
+    Same output as running detect_only once per threshold, without re-running the model.
+    """
+    if not raw_detections:
+        return []
+    bboxes, percents = zip(*raw_detections)
+    boxes = as_boxes(bboxes)
+
+    # Boxes ordered by the first (tightest) threshold they pass, then deduplicated in that order
+    passes = np.asarray(percents)[None, :] <= max_bbox_percent * np.asarray(threshold_scales, dtype=float)[:, None]
+    tiers = np.where(passes.any(axis=0), passes.argmax(axis=0), len(threshold_scales))
+    order = np.argsort(tiers, kind="stable")[:np.count_nonzero(passes.any(axis=0))]
+    boxes = boxes[order]
+    return boxes[nms(boxes)].tolist()
 
 
-def process_image_with_lama(image: MatLike, mask: MatLike, model_manager, quality_mode="balanced"):
-    """Process image with LaMA inpainting model.
+def _frame_size(image) -> tuple:
+    """(width, height) of a PIL image or an (H, W, C) IMAGE tensor."""
+    if isinstance(image, torch.Tensor):
+        return image.shape[1], image.shape[0]
+    return image.size
+
+
+def _tensor_to_pil(frame: torch.Tensor) -> Image.Image:
+    """Convert one (H, W, C) ComfyUI IMAGE frame in [0, 1] to a PIL image."""
+    return Image.fromarray((frame.cpu().numpy() * 255).astype(np.uint8))
+
+
+_RESAMPLE_MODES = {2: "bilinear", 3: "bicubic"}
+# Largest per-pixel difference (0-255) of preprocess_frames against the PIL processor path
+PREPROCESS_GRAY_TOLERANCE = 2
+
+
+def preprocess_frames(frames, image_processor, device: str, dtype=torch.float32):
+    """
+    Resize and normalize ComfyUI IMAGE frames into Florence-2 pixel_values with batched torch ops.
+
+    On CPU the resized values stay within PREPROCESS_GRAY_TOLERANCE gray levels of the
+    processor's PIL resize: torch's antialiased kernel rounds differently, mostly when upscaling.
 
     Args:
-        image: Input image
-        mask: Mask indicating regions to inpaint
-        model_manager: LaMA model manager
-        quality_mode: Quality/speed tradeoff
-            - "fast": ldm_steps=30, faster but lower quality
-            - "balanced": ldm_steps=50, good balance (default)
-            - "high": ldm_steps=100, slower but better quality
-    """
-    # Lazy import to avoid dependency conflicts
-    from iopaint.schema import HDStrategy, LDMSampler, InpaintRequest as Config
-
-    # Quality presets
-    steps_map = {
-        "fast": 30,
-        "balanced": 50,
-        "high": 100,
-    }
-
-    ldm_steps = steps_map.get(quality_mode, 50)
-
-    config = Config(
-        ldm_steps=ldm_steps,
-        ldm_sampler=LDMSampler.ddim,
-        hd_strategy=HDStrategy.CROP,
-        hd_strategy_crop_margin=128,  # Increased from 64 for better context
-        hd_strategy_crop_trigger_size=800,
-        hd_strategy_resize_limit=1600,
-    )
-    result = model_manager(image, mask, config)
+        frames: (B, H, W, C) tensor in [0, 1], or a list of (H, W, C) tensors (sizes may differ)
+        image_processor: The Florence-2 processor's image processor; its size, mean and std are used
+
+    Returns:
+        (B, 3, size, size) pixel_values, or None if the image processor configuration is not
+        a plain resize + normalize (callers then fall back to the processor)
+    """
+    size = getattr(image_processor, "size", None) or {}
+    mode = _RESAMPLE_MODES.get(int(getattr(image_processor, "resample", 3)))
+    if "height" not in size or "width" not in size or mode is None or getattr(image_processor, "do_center_crop", False):
+        return None
+
+    if isinstance(frames, torch.Tensor):
+        groups = [(list(range(frames.shape[0])), frames)]
+    else:
+        by_shape = {}
+        for i, frame in enumerate(frames):
+            by_shape.setdefault(tuple(frame.shape), []).append(i)
+        groups = [(indices, torch.stack([frames[i] for i in indices])) for indices in by_shape.values()]
+
+    # (x / 255 - mean) / std folded into one multiply-add per element
+    std = torch.tensor(image_processor.image_std, device=device).view(1, -1, 1, 1)
+    shift = -torch.tensor(image_processor.image_mean, device=device).view(1, -1, 1, 1) / std
+    output_size = (size["height"], size["width"])
+
+    pixel_values = None
+    if len(groups) > 1:
+        pixel_values = torch.empty((sum(len(indices) for indices, _ in groups), 3) + output_size, device=device)
+    for indices, batch in groups:
+        batch = batch[..., :3].to(device)
+        if batch.device.type == "cpu":
+            # Same uint8 quantization as the PIL path; the uint8 antialiased resize kernel is much faster on CPU
+            # (results may differ from PIL's by up to PREPROCESS_GRAY_TOLERANCE levels)
+            resized = torch.nn.functional.interpolate(
+                (batch * 255).to(torch.uint8).permute(0, 3, 1, 2), size=output_size, mode=mode,
+                align_corners=False, antialias=True
+            ).float()
+            scale = 1.0 / (255 * std)
+        else:
+            resized = torch.nn.functional.interpolate(
+                batch.float().permute(0, 3, 1, 2), size=output_size, mode=mode, align_corners=False, antialias=True
+            ).clamp_(0, 1)
+            scale = 1.0 / std
+        normalized = torch.addcmul(shift, resized, scale)
+        if pixel_values is None:
+            pixel_values = normalized
+        else:
+            pixel_values[torch.tensor(indices, device=device)] = normalized
+    return pixel_values.to(dtype)
+
+
+class FlorenceDetectionSession:
+    """
+    Florence-2 open-vocabulary detection state reused across all frames of one run.
+
+    - Each prompt is tokenized and embedded once, not once per frame.
+    - The vision encoder runs once per frame and is shared by all prompts.
+    - Decoding stops at a calibrated token budget instead of max_new_tokens=1024. The first
+      batch calibrates the budget; any frame that hits the budget without finishing its answer
+      is decoded again with the full limit, so results match the unbudgeted path.
+
+    When Pass 1 runs in a DetectionPool, model and processor are None and the session only
+    carries the prompts and statistics.
+    """
+
+    def __init__(self, model, processor, device: str, detection_prompt="watermark", decode_budget: int = None):
+        self.model = model
+        self.processor = processor
+        self.device = device
+        self.prompts = parse_detection_prompts(detection_prompt)
+        self.decode_budget = decode_budget  # None = calibrate on the first batch
+
+        self.image_token_id = getattr(processor, "image_token_id", None)
+        if self.image_token_id is None:
+            self.image_token_id = getattr(getattr(model, "config", None), "image_token_id", None)
+        self.supports_shared_encoder = hasattr(model, "get_image_features") and self.image_token_id is not None
+
+        tokenizer = getattr(processor, "tokenizer", None)
+        self.eos_token_id = getattr(tokenizer, "eos_token_id", None)
+        if self.eos_token_id is None:
+            self.eos_token_id = getattr(getattr(model, "generation_config", None), "eos_token_id", None)
+
+        self._prompt_inputs = {}  # prompt -> (input_ids, attention_mask, prompt_embeds), batch dim of 1
+        self.tokens_per_frame = []
+        self.budget_retries = 0
+
+        # ROI re-detection state: windows around every watermark position seen so far in this run
+        self.roi_windows = []
+        self.roi_batches = 0
+        self.roi_frames = 0
+        self.roi_full_frames = 0
+
+    def detect_raw_batch(self, images):
+        """
+        Run detection on a batch of frames. Returns one raw detection list per frame.
 
-    if result.dtype in [np.float64, np.float32]:
-        result = np.clip(result, 0, 255).astype(np.uint8)
+        Args:
+            images: List of PIL images, a ComfyUI IMAGE tensor (B, H, W, C), or a list of
+                (H, W, C) tensors. Tensors are resized and normalized on the device directly.
+        """
+        if len(images) == 0:
+            return []
+        is_tensor = isinstance(images, torch.Tensor) or isinstance(images[0], torch.Tensor)
+        if not self.supports_shared_encoder or self.eos_token_id is None:
+            if is_tensor:
+                images = [_tensor_to_pil(frame) for frame in images]
+            return detect_raw_batch(images, self.model, self.processor, self.device, self.prompts, len(images))
+
+        pixel_values = None
+        if is_tensor:
+            pixel_values = preprocess_frames(images, self.processor.image_processor, self.device)
+            if pixel_values is None:
+                images = [_tensor_to_pil(frame) for frame in images]
+        if pixel_values is None:
+            pixel_values = self.processor.image_processor(images=images, return_tensors="pt")["pixel_values"]
+        image_features = _encode_images(self.model, pixel_values.to(self.device))
+        image_sizes = [_frame_size(image) for image in images]
+
+        per_prompt_raw = []
+        for prompt in self.prompts:
+            generated_ids = self._decode(prompt, len(image_sizes), image_features)
+            generated_texts = self.processor.batch_decode(generated_ids, skip_special_tokens=False)
+            per_prompt_raw.append([
+                _raw_detections_from_answer(
+                    self.processor.post_process_generation(
+                        text, task=TaskType.OPEN_VOCAB_DETECTION.value, image_size=image_size
+                    ),
+                    image_size,
+                )
+                for text, image_size in zip(generated_texts, image_sizes)
+            ])
 
-    return result
+        return [_merge_prompt_detections(list(frame_raw)) for frame_raw in zip(*per_prompt_raw)]
 
+    def detect_raw_batch_roi(self, images: list):
+        """
+        Detect only inside the ROI windows around previously seen watermark positions.
 
-def make_region_transparent(image: Image.Image, mask: Image.Image):
-    """Make watermark regions transparent."""
-    image = image.convert("RGBA")
-    mask = mask.convert("L")
-    transparent_image = Image.new("RGBA", image.size)
-    for x in range(image.width):
-        for y in range(image.height):
-            if mask.getpixel((x, y)) > 0:
-                transparent_image.putpixel((x, y), (0, 0, 0, 0))
+        Crops are taken at native resolution, so small watermarks are not squashed by the
+        Florence-2 input resize. Detections are mapped back to frame coordinates with area
+        percent relative to the full frame. Frames whose ROI detection comes up empty are
+        re-detected on the full frame.
+        """
+        if len(images) == 0:
+            return []
+
+        windows = self.roi_windows
+        if windows:
+            frame_width, frame_height = _frame_size(images[0])
+            frame_area = frame_width * frame_height
+            window_area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in windows)
+            if window_area > ROI_MAX_COVERAGE * frame_area:
+                windows = []
+
+        self.roi_batches += 1
+        if not windows or self.roi_batches % ROI_FULL_FRAME_INTERVAL == 0:
+            self.roi_full_frames += len(images)
+            return self.detect_raw_batch(images)
+
+        crops = [
+            image[y1:y2, x1:x2] if isinstance(image, torch.Tensor) else image.crop((x1, y1, x2, y2))
+            for image in images for x1, y1, x2, y2 in windows
+        ]
+        crop_raw = self.detect_raw_batch(crops)
+
+        results = []
+        for image_idx, image in enumerate(images):
+            image_size = _frame_size(image)
+            per_window = []
+            for window_idx, (wx1, wy1, _, _) in enumerate(windows):
+                raw_detections = crop_raw[image_idx * len(windows) + window_idx]
+                boxes = as_boxes([bbox for bbox, _ in raw_detections]) + np.array([wx1, wy1, wx1, wy1])
+                per_window.append(list(zip(boxes.tolist(), area_percent(boxes, image_size).tolist())))
+            results.append(_merge_prompt_detections(per_window))
+
+        empty = [i for i, raw_detections in enumerate(results) if not raw_detections]
+        if empty:
+            self.roi_full_frames += len(empty)
+            full_raw = self.detect_raw_batch(images[empty] if isinstance(images, torch.Tensor)
+                                             else [images[i] for i in empty])
+            for i, raw_detections in zip(empty, full_raw):
+                results[i] = raw_detections
+
+        self.roi_frames += len(images) - len(empty)
+        return results
+
+    def remember_roi(self, bboxes: list, image_size: tuple):
+        """Add windows around accepted bboxes to the ROI set used by detect_raw_batch_roi."""
+        if bboxes:
+            self.roi_windows = merge_windows(self.roi_windows + roi_windows_around(bboxes, image_size))
+
+    @torch.no_grad()
+    def _prompt_tensors(self, prompt: str):
+        """Tokenize and embed a prompt once; token ids do not depend on the image content."""
+        if prompt not in self._prompt_inputs:
+            text = TaskType.OPEN_VOCAB_DETECTION.value + prompt
+            placeholder = Image.new("RGB", (64, 64))
+            inputs = self.processor(text=[text], images=[placeholder], return_tensors="pt")
+            input_ids = inputs["input_ids"].to(self.device)
+            attention_mask = inputs["attention_mask"].to(self.device)
+            prompt_embeds = self.model.get_input_embeddings()(input_ids)
+            self._prompt_inputs[prompt] = (input_ids, attention_mask, prompt_embeds)
+        return self._prompt_inputs[prompt]
+
+    def _decode(self, prompt: str, batch: int, image_features):
+        """Decode one prompt for a batch of frames within the token budget."""
+        input_ids, attention_mask, prompt_embeds = self._prompt_tensors(prompt)
+        input_ids = input_ids.expand(batch, -1)
+        attention_mask = attention_mask.expand(batch, -1)
+        prompt_embeds = prompt_embeds.expand(batch, -1, -1)
+
+        budget = self.decode_budget or DETECTION_MAX_NEW_TOKENS
+        generated_ids = _generate_from_image_features(
+            self.model, input_ids, attention_mask, image_features, self.image_token_id,
+            max_new_tokens=budget, prompt_embeds=prompt_embeds
+        )
+        token_counts, finished = self._count_tokens(generated_ids)
+
+        unfinished = [i for i, done in enumerate(finished) if not done]
+        if unfinished and budget < DETECTION_MAX_NEW_TOKENS:
+            # Answer did not fit in the budget - decode those frames again with the full limit
+            self.budget_retries += len(unfinished)
+            index = torch.tensor(unfinished, device=image_features.device)
+            retry_ids = _generate_from_image_features(
+                self.model, input_ids[:len(unfinished)], attention_mask[:len(unfinished)],
+                image_features.index_select(0, index), self.image_token_id,
+                max_new_tokens=DETECTION_MAX_NEW_TOKENS, prompt_embeds=prompt_embeds[:len(unfinished)]
+            )
+            retry_counts, _ = self._count_tokens(retry_ids)
+            rows = [row for row in generated_ids]
+            for slot, i in enumerate(unfinished):
+                rows[i] = retry_ids[slot]
+                token_counts[i] = retry_counts[slot]
+            generated_ids = torch.nn.utils.rnn.pad_sequence(
+                rows, batch_first=True, padding_value=getattr(self.processor.tokenizer, "pad_token_id", 0) or 0
+            )
+            self.decode_budget = min(DETECTION_MAX_NEW_TOKENS, max(self.decode_budget, 2 * max(retry_counts)))
+
+        if self.decode_budget is None:
+            self.decode_budget = min(DETECTION_MAX_NEW_TOKENS, max(DETECTION_MIN_DECODE_BUDGET, 2 * max(token_counts)))
+            logger.info(f"Detection decode budget calibrated to {self.decode_budget} tokens "
+                        f"(longest answer so far: {max(token_counts)} tokens)")
+
+        self.tokens_per_frame.extend(token_counts)
+        return generated_ids
+
+    def _count_tokens(self, generated_ids):
+        """Return (tokens generated, finished with EOS) for each row, excluding the decoder start token."""
+        counts = []
+        finished = []
+        for row in generated_ids[:, 1:].tolist():
+            if self.eos_token_id in row:
+                counts.append(row.index(self.eos_token_id) + 1)
+                finished.append(True)
             else:
-                transparent_image.putpixel((x, y), image.getpixel((x, y)))
-    return transparent_image
+                counts.append(len(row))
+                finished.append(False)
+        return counts, finished
+
+    def log_stats(self):
+        """Log decoded tokens per frame so the decode budget savings can be checked."""
+        if self.roi_frames or self.roi_full_frames:
+            logger.info(f"ROI detection: {self.roi_frames} frames resolved inside ROI windows, "
+                        f"{self.roi_full_frames} full-frame detections, {len(self.roi_windows)} windows")
+        if not self.tokens_per_frame:
+            return
+        mean_tokens = sum(self.tokens_per_frame) / len(self.tokens_per_frame)
+        logger.info(
+            f"Detection decoding: {len(self.tokens_per_frame)} frame/prompt runs, "
+            f"{mean_tokens:.1f} tokens/frame on average, max {max(self.tokens_per_frame)}, "
+            f"budget {self.decode_budget}, {self.budget_retries} budget retries"
+        )
+
+
+def roi_windows_around(bboxes: list, image_size: tuple, margin_scale: float = ROI_MARGIN_SCALE,
+                       margin_pixels: int = ROI_MARGIN_PIXELS, min_window: int = ROI_MIN_WINDOW):
+    """Build generous [x1, y1, x2, y2] detection windows around bboxes, clamped to the image."""
+    boxes = as_boxes(bboxes)
+    sides = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+    grow = (sides * margin_scale).astype(np.int64) + margin_pixels
+    windows = boxes + grow[:, None] * np.array([-1, -1, 1, 1])
+
+    # Enforce a minimum window side around the box center
+    centers = (boxes[:, :2] + boxes[:, 2:]) // 2
+    half = min_window // 2
+    windows[:, :2] = np.minimum(windows[:, :2], centers - half)
+    windows[:, 2:] = np.maximum(windows[:, 2:], centers + half)
+
+    return pad_and_clip(windows, 0, image_size).tolist()
+
+
+def merge_windows(windows: list):
+    """Merge overlapping [x1, y1, x2, y2] windows into their bounding union until none overlap."""
+    return union_merge(windows).tolist()
 
 
 def detect_with_enhanced_sensitivity(image: Image.Image, model, processor, device: str,
-                                    max_bbox_percent: float, detection_prompt: str = "watermark"):
+                                    max_bbox_percent: float, detection_prompt: str = "watermark",
+                                    cache: DetectionCache = None):
     """
     Enhanced detection using multiple thresholds to catch faint watermarks.
 
     This is especially useful for fade-in watermarks at the beginning of videos.
+    Florence-2 runs once; the 1x/1.5x/2x area thresholds are applied to the raw detections.
+    If a DetectionCache is given, it is consulted before running the model.
     """
-    # Try detection with multiple max_bbox_percent thresholds
-    thresholds = [max_bbox_percent, max_bbox_percent * 1.5, max_bbox_percent * 2.0]
+    if cache is not None:
+        key = cache.make_key(
+            cache.frame_hash(image), parse_detection_prompts(detection_prompt), max_bbox_percent, _model_id(model), True
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
 
-    all_bboxes = []
+    raw_detections = detect_raw(image, model, processor, device, detection_prompt)
+    bboxes = enhanced_filter_raw_detections(raw_detections, max_bbox_percent)
 
-    for threshold in thresholds:
-        bboxes = detect_only(image, model, processor, device, threshold, detection_prompt)
-        all_bboxes.extend(bboxes)
+    if cache is not None:
+        cache.put(key, bboxes)
+    return bboxes
 
-    # Remove duplicates (bboxes that are very similar)
-    if not all_bboxes:
-        return []
 
-    unique_bboxes = []
-    for bbox in all_bboxes:
-        is_duplicate = False
-        for existing in unique_bboxes:
-            # Check if bboxes overlap significantly
-            x1, y1, x2, y2 = bbox
-            ex1, ey1, ex2, ey2 = existing
+def _model_id(model) -> str:
+    """Identify a loaded Florence-2 model (and its precision) for detection cache keys."""
+    name = getattr(model, "name_or_path", "") or type(model).__name__
+    return f"{name}:{getattr(model, 'detection_precision', 'fp32')}"
+
+
+def _model_dtype(model):
+    """Floating point dtype expected for the model's pixel inputs."""
+    return getattr(model, "dtype", torch.float32)
+
+
+def reduce_florence_precision(model, precision: str):
+    """
+    Return a reduced-precision copy of an fp32 Florence-2 model.
+
+    - "bf16": all weights cast to bfloat16
+    - "int8": dynamic int8 quantization of the nn.Linear layers (CPU only)
+    """
+    if precision == "bf16":
+        reduced = copy.deepcopy(model).to(torch.bfloat16)
+    elif precision == "int8":
+        reduced = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    else:
+        raise ValueError(f"Unsupported Florence-2 precision: {precision}")
+
+    reduced.eval()
+    reduced.detection_precision = precision
+    return reduced
 
-            # Calculate IoU (Intersection over Union)
-            xi1 = max(x1, ex1)
-            yi1 = max(y1, ey1)
-            xi2 = min(x2, ex2)
-            yi2 = min(y2, ey2)
 
-            if xi1 < xi2 and yi1 < yi2:
-                inter_area = (xi2 - xi1) * (yi2 - yi1)
-                bbox_area = (x2 - x1) * (y2 - y1)
-                existing_area = (ex2 - ex1) * (ey2 - ey1)
-                union_area = bbox_area + existing_area - inter_area
+def _calibration_key(calibration_images: list, detection_prompt) -> tuple:
+    """Identify a precision-gate run by its calibration frames and prompt(s)."""
+    prompts = detection_prompt if isinstance(detection_prompt, str) else "|".join(detection_prompt)
+    return tuple(DetectionCache.frame_hash(image) for image in calibration_images) + (prompts,)
 
-                iou = inter_area / union_area if union_area > 0 else 0
 
-                if iou > 0.5:  # 50% overlap = duplicate
-                    is_duplicate = True
-                    break
+def _module_nbytes(model) -> int:
+    """Bytes held by a model's weights, including packed dynamic-quantized linear weights."""
+    total = 0
+    for value in model.state_dict().values():
+        tensors = value if isinstance(value, (tuple, list)) else [value]
+        for tensor in tensors:
+            if isinstance(tensor, torch.Tensor):
+                total += tensor.numel() * tensor.element_size()
+    return total
 
-        if not is_duplicate:
-            unique_bboxes.append(bbox)
 
-    return unique_bboxes
+def detection_agreement(reference: list, candidate: list) -> float:
+    """
+    Score how well candidate bboxes reproduce reference bboxes of the same frame (0-1).
+
+    Each reference box is scored by its best IoU with a candidate box; frames where both
+    sides found nothing agree fully, frames where only one side found something score 0.
+    """
+    if not reference and not candidate:
+        return 1.0
+    if not reference or not candidate:
+        return 0.0
+    return float(iou_matrix(reference, candidate).max(axis=1).mean())
+
+
+def masked_optical_flow(target_gray: np.ndarray, source_gray: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    Dense (H, W, 2) flow mapping target pixels to their position in source, measured outside mask.
+
+    Inside the dilated mask both frames show the static watermark, so the Farneback flow there is
+    replaced by a normalized convolution of the valid flow around it: the background motion of
+    the context window carries over smoothly into the hole. Everything runs at FLOW_SCALE.
+    """
+    height, width = target_gray.shape
+    size = (max(1, round(width * FLOW_SCALE)), max(1, round(height * FLOW_SCALE)))
+    target_small = cv2.resize(target_gray, size, interpolation=cv2.INTER_AREA)
+    source_small = cv2.resize(source_gray, size, interpolation=cv2.INTER_AREA)
+    flow = cv2.calcOpticalFlowFarneback(target_small, source_small, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+
+    kernel = np.ones((2 * FLOW_MASK_DILATION + 1,) * 2, dtype=np.uint8)
+    valid = cv2.resize(cv2.dilate(mask, kernel), size, interpolation=cv2.INTER_NEAREST) == 0
+    if not valid.any():
+        return np.zeros((height, width, 2), dtype=np.float32)
+
+    sigma = FLOW_FILL_SIGMA * FLOW_SCALE
+    weight = cv2.GaussianBlur(valid.astype(np.float32), (0, 0), sigma)
+    filled = cv2.GaussianBlur(flow * valid[:, :, None], (0, 0), sigma) / np.maximum(weight, 1e-6)[:, :, None]
+    # Far from any valid pixel the blur underflows; use the mean motion of the window there
+    filled = np.where(weight[:, :, None] > 1e-4, filled, flow[valid].mean(axis=0))
+    flow = np.where(valid[:, :, None], flow, filled).astype(np.float32)
+    return cv2.resize(flow, (width, height), interpolation=cv2.INTER_LINEAR) / FLOW_SCALE
+
+
+def warp_by_flow(image: np.ndarray, flow: np.ndarray) -> np.ndarray:
+    """Sample image at every pixel's flow target (see masked_optical_flow)."""
+    height, width = flow.shape[:2]
+    grid_x, grid_y = np.meshgrid(np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32))
+    return cv2.remap(image, grid_x + flow[:, :, 0], grid_y + flow[:, :, 1], cv2.INTER_LINEAR,
+                     borderMode=cv2.BORDER_REPLICATE)
 
 
 def sharpen_image(image_np: np.ndarray, strength: float = 1.0):
@@ -362,6 +1090,172 @@ def sharpen_image(image_np: np.ndarray, strength: float = 1.0):
     return sharpened
 
 
+def plan_motion_keyframes(frames, fps: float, min_gap: int = 1, chunk_size: int = 256):
+    """
+    Choose Pass 1 keyframes from cheap downsampled frame statistics instead of a fixed stride.
+
+    A frame becomes a keyframe when:
+    - it starts a new scene (gray histogram jump against the previous frame), or
+    - the watermark bands changed since the last keyframe and at least `min_gap` frames passed, or
+    - MOTION_MAX_GAP_SECONDS passed since the last keyframe.
+
+    Args:
+        frames: ComfyUI IMAGE tensor (B, H, W, C) with values in 0-1
+        fps: Frames per second of the video
+        min_gap: Minimum spacing between keyframes triggered by band changes
+
+    Returns:
+        Sorted list of keyframe indices (always starts with 0)
+    """
+    total_frames, height, width = frames.shape[0], frames.shape[1], frames.shape[2]
+    if total_frames == 0:
+        return []
+
+    step = max(1, max(height, width) // MOTION_ANALYSIS_SIZE)
+    max_gap = max(min_gap, int(round(fps * MOTION_MAX_GAP_SECONDS)))
+
+    grid = MOTION_TILE_GRID
+    band_mask = torch.zeros((grid, grid), dtype=torch.bool)
+    band_mask[:WATERMARK_BAND_TILES, :] = True
+    band_mask[-WATERMARK_BAND_TILES:, :] = True
+    band_mask[:, :WATERMARK_BAND_TILES] = True
+    band_mask[:, -WATERMARK_BAND_TILES:] = True
+
+    keyframes = [0]
+    cuts = 0
+    last_key_gray = None
+    prev_hist = None
+
+    for chunk_start in range(0, total_frames, chunk_size):
+        chunk = frames[chunk_start:chunk_start + chunk_size, ::step, ::step, :]
+        gray = chunk.float().mean(dim=-1).cpu()  # (N, h, w)
+
+        bins = (gray.clamp(0, 1) * (MOTION_HISTOGRAM_BINS - 1)).round().long().flatten(1)
+        hists = torch.zeros((gray.shape[0], MOTION_HISTOGRAM_BINS)).scatter_add_(
+            1, bins, torch.ones_like(bins, dtype=torch.float32)
+        ) / bins.shape[1]
+
+        for i in range(gray.shape[0]):
+            frame_idx = chunk_start + i
+            if frame_idx == 0:
+                last_key_gray = gray[i]
+                prev_hist = hists[i]
+                continue
+
+            cut_score = 0.5 * (hists[i] - prev_hist).abs().sum().item()
+            prev_hist = hists[i]
+            gap = frame_idx - keyframes[-1]
+
+            if cut_score > SCENE_CUT_THRESHOLD:
+                cuts += 1
+                is_keyframe = True
+            elif gap >= max_gap:
+                is_keyframe = True
+            elif gap >= min_gap:
+                tile_change = torch.nn.functional.adaptive_avg_pool2d(
+                    (gray[i] - last_key_gray).abs()[None, None], grid
+                )[0, 0]
+                band_change = tile_change[band_mask].max().item()
+                is_keyframe = band_change > BAND_CHANGE_THRESHOLD
+            else:
+                is_keyframe = False
+
+            if is_keyframe:
+                keyframes.append(frame_idx)
+                last_key_gray = gray[i]
+
+    logger.info(f"Motion schedule: {len(keyframes)} keyframes for {total_frames} frames "
+                f"({cuts} scene cuts, max gap {max_gap} frames)")
+    return keyframes
+
+
+def bbox_sets_match(bboxes: list, other: list, iou_threshold: float = BISECT_MATCH_IOU):
+    """True if both bbox lists describe the same watermark positions (one-to-one IoU match)."""
+    if len(bboxes) != len(other):
+        return False
+    return bool((greedy_match(bboxes, other, iou_threshold) >= 0).all())
+
+
+def stabilize_bbox_tracks(detections: dict, keyframes: list, mode: str = "median",
+                          match_iou: float = STABILIZE_MATCH_IOU) -> dict:
+    """
+    Cluster keyframe detections into watermark tracks and give each track segment one box.
+
+    A segment follows one watermark over consecutive keyframes while each keyframe has a box with
+    IoU >= match_iou against the segment's first box; a keyframe without such a box ends it. All
+    boxes of a segment are replaced by their per-coordinate median ("median") or their union
+    ("envelope"), so consecutive keyframes produce identical masks instead of jittering ones.
+
+    Returns a new keyframe -> bboxes dict ("off" returns detections unchanged).
+    """
+    if mode == "off":
+        return detections
+
+    segments = []  # [(frame, bbox), ...] per track segment
+    open_segments = []
+    for frame in keyframes:
+        bboxes = detections.get(frame, [])
+        matches = greedy_match([segment[0][1] for segment in open_segments], bboxes, match_iou)
+        still_open = []
+        for segment, match in zip(open_segments, matches):
+            if match >= 0:
+                segment.append((frame, bboxes[match]))
+                still_open.append(segment)
+        for index in sorted(set(range(len(bboxes))) - set(matches.tolist())):
+            segment = [(frame, bboxes[index])]
+            segments.append(segment)
+            still_open.append(segment)
+        open_segments = still_open
+
+    stabilized = {}
+    for segment in segments:
+        boxes = np.array([bbox for _, bbox in segment])
+        if mode == "envelope":
+            canonical = np.concatenate([boxes[:, :2].min(axis=0), boxes[:, 2:].max(axis=0)])
+        else:
+            canonical = np.round(np.median(boxes, axis=0))
+        canonical = [int(value) for value in canonical]
+        for frame, _ in segment:
+            frame_bboxes = stabilized.setdefault(frame, [])
+            if canonical not in frame_bboxes:
+                frame_bboxes.append(canonical)
+
+    return {frame: stabilized[frame] for frame in keyframes if frame in stabilized}
+
+
+def _frame_to_gray(frame_tensor) -> np.ndarray:
+    """Convert one ComfyUI frame (H, W, C) in 0-1 to a uint8 grayscale image."""
+    img_np = (frame_tensor.cpu().numpy() * 255).astype(np.uint8)
+    return cv2.cvtColor(img_np, cv2.COLOR_RGB2GRAY)
+
+
+def track_template(gray: np.ndarray, template: np.ndarray, bbox: list, search_margin: int = TRACK_SEARCH_MARGIN):
+    """
+    Find a watermark template near its last position with cv2.matchTemplate.
+
+    Returns:
+        (new_bbox, score) - score is the normalized correlation (-1..1), 0 if the search failed
+    """
+    x1, y1, x2, y2 = bbox
+    template_h, template_w = template.shape[:2]
+    margin = max(x2 - x1, y2 - y1) // 2 + search_margin
+
+    height, width = gray.shape[:2]
+    sx1, sy1 = max(0, x1 - margin), max(0, y1 - margin)
+    sx2, sy2 = min(width, x2 + margin), min(height, y2 + margin)
+    window = gray[sy1:sy2, sx1:sx2]
+    if window.shape[0] < template_h or window.shape[1] < template_w:
+        return bbox, 0.0
+
+    scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+    _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+    if not np.isfinite(score):
+        return bbox, 0.0
+
+    nx1, ny1 = sx1 + dx, sy1 + dy
+    return [nx1, ny1, nx1 + template_w, ny1 + template_h], float(score)
+
+
 class SoraVideoWatermarkRemover:
     """
     ComfyUI node for removing Sora/Sora2 watermarks from video frames using AI.
@@ -372,6 +1266,16 @@ class SoraVideoWatermarkRemover:
         self.florence_model = None
         self.florence_processor = None
         self.lama_model = None
+        self.detection_cache = None
+        self.detection_pool = None
+        self.florence_model_id = None
+        self.florence_precision = None
+        self.rejected_precisions = {}  # precision -> calibration key of the clip it failed on
+        self.render_stats = self._empty_render_stats()
+        self.inpaint_reuse = {}  # window + boxes -> context ring and fill of the last inpainted frame
+        self.flow_anchor = None  # window keys and (gray, fill) windows of the last flow-propagated call's last frame
+        self.inpaint_engine = None
+        self.inpaint_engine_key = None
         # Select device: CUDA > MPS (Apple Silicon) > CPU
         if torch.cuda.is_available():
             self.device = "cuda"
@@ -406,7 +1310,7 @@ class SoraVideoWatermarkRemover:
                 "detection_skip": ("INT", {
                     "default": 1,
                     "min": 1,
-                    "max": 10,
+                    "max": 60,
                     "step": 1
                 }),
                 "fade_in": ("FLOAT", {
@@ -442,6 +1346,67 @@ class SoraVideoWatermarkRemover:
                     "max": 100,
                     "step": 1
                 }),
+                "detection_batch_size": ("INT", {
+                    "default": DEFAULT_DETECTION_BATCH_SIZE,
+                    "min": 1,
+                    "max": 64,
+                    "step": 1
+                }),
+                "roi_detection": ("BOOLEAN", {
+                    "default": False
+                }),
+                "detection_schedule": (DETECTION_SCHEDULES, {
+                    "default": "uniform"
+                }),
+                "detection_cache": ("BOOLEAN", {
+                    "default": False
+                }),
+                "florence_precision": (FLORENCE_PRECISIONS, {
+                    "default": "fp32"
+                }),
+                "detector_model": ("STRING", {
+                    "default": DEFAULT_DETECTOR_MODEL,
+                    "multiline": False
+                }),
+                "execution_mode": (EXECUTION_MODES, {
+                    "default": "eager"
+                }),
+                "detection_workers": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 64,
+                    "step": 1
+                }),
+                "pipeline": ("BOOLEAN", {
+                    "default": False
+                }),
+                "bbox_stabilization": (BBOX_STABILIZATION_MODES, {
+                    "default": "off"
+                }),
+                "bbox_interpolation": (BBOX_INTERPOLATION_MODES, {
+                    "default": "hold"
+                }),
+                "inpaint_batch_size": ("INT", {
+                    "default": 1,
+                    "min": 1,
+                    "max": 64,
+                    "step": 1
+                }),
+                "inpaint_reuse_threshold": ("FLOAT", {
+                    "default": 0.0,
+                    "min": 0.0,
+                    "max": 0.1,
+                    "step": 0.001
+                }),
+                "inpaint_keyframe_interval": ("INT", {
+                    "default": 1,
+                    "min": 1,
+                    "max": 30,
+                    "step": 1
+                }),
+                "inpaint_backend": (INPAINT_BACKENDS, {
+                    "default": "lama"
+                }),
             }
         }
 
@@ -449,11 +1414,22 @@ class SoraVideoWatermarkRemover:
     FUNCTION = "remove_watermark"
     CATEGORY = "JM-Nodes/Video/Sora"
 
-    def load_models(self, transparent=False):
-        """Load Florence-2 and LaMA models if not already loaded."""
+    def load_models(self, transparent=False, florence_precision="fp32", calibration_images=None,
+                    detection_prompt="watermark", detector_model=DEFAULT_DETECTOR_MODEL, florence=True):
+        """Load Florence-2 and LaMA models if not already loaded.
+
+        Args:
+            transparent: Skip LaMA when the inpainting engine does not need it
+            florence_precision: "fp32", "bf16" or "int8"; reduced precision is only used if it
+                passes the accuracy gate on `calibration_images`
+            calibration_images: PIL frames used by the reduced-precision accuracy gate
+            detection_prompt: Prompt(s) used by the accuracy gate
+            detector_model: Florence-2 alias ("base"/"large"), HuggingFace id or local path
+            florence: Load Florence-2; False when detection runs only in worker processes
+        """
         # Lazy import to avoid dependency conflicts
         try:
-            from transformers import AutoProcessor, Florence2ForConditionalGeneration
+            import transformers  # noqa: F401
         except ImportError as e:
             error_msg = (
                 f"Failed to import transformers: {e}\n"
@@ -464,24 +1440,49 @@ class SoraVideoWatermarkRemover:
             )
             raise ImportError(error_msg)
 
-        if self.florence_model is None:
-            logger.info(f"Loading Florence-2 model on {self.device}...")
-            logger.info("If this is your first time, Florence-2 model (~1GB) will be downloaded from HuggingFace.")
-            logger.info("This may take several minutes depending on your internet connection...")
-            logger.info("Model will be cached in ~/.cache/huggingface/hub/ for future use.")
+        if florence:
+            model_id = resolve_florence_model_id(detector_model)
+            if self.florence_model is not None and self.florence_model_id != model_id:
+                # Detector changed - drop the old model (and its rejected precisions) before loading
+                self.florence_model = None
+                self.rejected_precisions.clear()
+
+            calibration_images = calibration_images or []
+            calibration_key = _calibration_key(calibration_images, detection_prompt)
+            if florence_precision == "int8" and self.device != "cpu":
+                logger.warning("int8 dynamic quantization only runs on CPU, keeping fp32 Florence-2")
+                florence_precision = "fp32"
+            elif self.rejected_precisions.get(florence_precision) == calibration_key:
+                logger.warning(f"Florence-2 {florence_precision} failed the accuracy gate on these calibration "
+                               f"frames in an earlier run, using fp32")
+                florence_precision = "fp32"
+
+            if self.florence_model is not None and self.florence_precision != florence_precision:
+                if self.florence_precision == "fp32":
+                    # The loaded fp32 weights are the gate's reference, reduce them without reloading
+                    self._apply_florence_precision(florence_precision, calibration_images, detection_prompt)
+                else:
+                    # Reduced weights loaded - reload the fp32 weights and reduce them again
+                    self.florence_model = None
 
-            try:
-                self.florence_model = Florence2ForConditionalGeneration.from_pretrained(
-                    "florence-community/Florence-2-large"
-                ).to(self.device).eval()
-                self.florence_processor = AutoProcessor.from_pretrained(
-                    "florence-community/Florence-2-large"
-                )
-                logger.info("Florence-2 model loaded successfully")
-            except Exception as e:
-                logger.error(f"Failed to load Florence-2 model: {e}")
-                logger.error("Please check your internet connection or HuggingFace access.")
-                raise
+            if self.florence_model is None:
+                logger.info(f"Loading Florence-2 model {model_id} on {self.device}...")
+                logger.info("If this is your first time, the Florence-2 model will be downloaded from HuggingFace.")
+                logger.info("This may take several minutes depending on your internet connection...")
+                logger.info("Model will be cached in ~/.cache/huggingface/hub/ for future use.")
+
+                try:
+                    self.florence_model, self.florence_processor = load_florence2_model(self.device, model_id)
+                    self.florence_model_id = model_id
+                    self.florence_precision = "fp32"
+                    logger.info("Florence-2 model loaded successfully")
+                except Exception as e:
+                    logger.error(f"Failed to load Florence-2 model: {e}")
+                    logger.error("Please check your internet connection or HuggingFace access.")
+                    raise
+
+                if florence_precision != "fp32":
+                    self._apply_florence_precision(florence_precision, calibration_images, detection_prompt)
 
         if not transparent and self.lama_model is None:
             logger.info(f"Loading LaMA model on {self.device}...")
@@ -495,18 +1496,607 @@ class SoraVideoWatermarkRemover:
                 logger.error("Please ensure LaMA model is downloaded. Run: python install.py")
                 raise
 
+    def _apply_florence_precision(self, precision, calibration_images, detection_prompt):
+        """
+        Swap in a reduced-precision Florence-2 if it reproduces the fp32 boxes.
+
+        Both models detect on the calibration frames; the reduced model is refused when the
+        mean IoU against the fp32 reference drops below PRECISION_MIN_IOU. Weight memory and
+        per-frame latency of both modes are logged. A refusal is remembered for these
+        calibration frames only, so a different clip runs the gate again.
+        """
+        if not calibration_images:
+            logger.warning(f"No calibration frames to verify Florence-2 {precision}, keeping fp32")
+            return
+
+        reference_model = self.florence_model
+        candidate_model = reduce_florence_precision(reference_model, precision)
+
+        outputs = {}
+        for name, model in (("fp32", reference_model), (precision, candidate_model)):
+            start = time.time()
+            outputs[name] = detect_raw_batch(
+                calibration_images, model, self.florence_processor, self.device, detection_prompt
+            )
+            latency = (time.time() - start) / len(calibration_images)
+            logger.info(f"Florence-2 {name}: {_module_nbytes(model) / 1024 ** 2:.0f} MB weights, "
+                        f"{latency:.2f}s/frame on {len(calibration_images)} calibration frames")
+
+        agreement = sum(
+            detection_agreement([bbox for bbox, _ in reference], [bbox for bbox, _ in candidate])
+            for reference, candidate in zip(outputs["fp32"], outputs[precision])
+        ) / len(calibration_images)
+
+        if agreement < PRECISION_MIN_IOU:
+            logger.warning(f"Florence-2 {precision} refused: mean IoU {agreement:.3f} against fp32 "
+                           f"is below {PRECISION_MIN_IOU}, keeping fp32")
+            self.rejected_precisions[precision] = _calibration_key(calibration_images, detection_prompt)
+            return
+
+        logger.info(f"Florence-2 {precision} accepted: mean IoU {agreement:.3f} against fp32")
+        self.florence_model = candidate_model
+        self.florence_precision = precision
+
+    def _apply_execution_mode(self, execution_mode, transparent=False, florence=True):
+        """Compile (or return to eager) the loaded Florence-2 and LaMA models."""
+        florence = florence and self.florence_model is not None
+        if execution_mode != "compiled":
+            if florence:
+                uncompile_florence(self.florence_model)
+            if self.lama_model is not None:
+                unfreeze_lama(self.lama_model)
+            return
+
+        size = getattr(getattr(self.florence_processor, "image_processor", None), "size", None) or {}
+        image_size = (size.get("height", 768), size.get("width", 768))
+        if florence and getattr(self.florence_model, "execution_mode", "eager") != "compiled":
+            start = time.time()
+            if compile_florence(self.florence_model, image_size, self.device):
+                logger.info(f"Florence-2 vision encoder compiled in {time.time() - start:.1f}s")
+        if not transparent and self.lama_model is not None:
+            freeze_lama(self.lama_model, self.device)
+
+    def _get_detection_cache(self):
+        """Open the persistent detection cache once per node instance and reset its run counters."""
+        if self.detection_cache is None:
+            try:
+                self.detection_cache = DetectionCache()
+            except Exception as e:
+                logger.warning(f"Detection cache unavailable, running without it: {e}")
+                return None
+        self.detection_cache.reset_stats()
+        return self.detection_cache
+
+    def _detector_id(self):
+        """Detection cache id of the Florence-2 model running Pass 1, in this process or in the workers."""
+        if self.detection_pool is not None:
+            _, model_id, precision = self.detection_pool.config
+            return f"{model_id}:{precision}"
+        return _model_id(self.florence_model)
+
+    def _detect_keyframes(self, session, frames, keyframes, batch_size, max_bbox_percent,
+                          enhanced_detection=False, roi_detection=False, cache=None):
+        """
+        Run Florence-2 detection on the given frame indices in batches.
+
+        Frames found in the detection cache (if given) skip the model.
+
+        Returns:
+            Dict frame_idx -> [bbox, ...] for every requested keyframe (empty list if nothing found)
+        """
+        results = {}
+        total_frames = frames.shape[0]
+
+        frame_size = (frames.shape[2], frames.shape[1])
+        # ROI windows are sequential session state, so ROI detection always runs in-process
+        pool = None if roi_detection else self.detection_pool
+        step = batch_size * len(pool.workers) if pool is not None else batch_size
+
+        for batch_start in range(0, len(keyframes), step):
+            batch_frames = keyframes[batch_start:batch_start + step]
+
+            # Resolve cached frames first
+            pending = []  # (frame_idx, cache_key)
+            for frame_idx in batch_frames:
+                cache_key = None
+                if cache is not None:
+                    frame_uint8 = (frames[frame_idx] * 255).to(torch.uint8).cpu().numpy()
+                    cache_key = cache.make_key(
+                        cache.frame_hash(frame_uint8), session.prompts, max_bbox_percent,
+                        self._detector_id(), enhanced_detection
+                    )
+                    cached = cache.get(cache_key)
+                    if cached is not None:
+                        results[frame_idx] = cached
+                        continue
+                pending.append((frame_idx, cache_key))
+
+            # Run Florence-2 once per frame, then apply the area filter in memory
+            pending_indices = [frame_idx for frame_idx, _ in pending]
+            if pool is not None:
+                raw_batch = pool.detect_raw_batch(frames, pending_indices, session.prompts, batch_size)
+            else:
+                # Frames stay in the IMAGE tensor; the session resizes and normalizes the whole batch at once
+                pending_frames = frames[pending_indices]
+                if roi_detection:
+                    raw_batch = session.detect_raw_batch_roi(pending_frames)
+                else:
+                    raw_batch = session.detect_raw_batch(pending_frames)
+
+            # Use enhanced (multi-threshold) filtering if enabled
+            for (frame_idx, cache_key), raw in zip(pending, raw_batch):
+                if enhanced_detection:
+                    bboxes = enhanced_filter_raw_detections(raw, max_bbox_percent)
+                else:
+                    bboxes = filter_raw_detections(raw, max_bbox_percent)
+                results[frame_idx] = bboxes
+                if cache is not None:
+                    cache.put(cache_key, bboxes)
+
+            if roi_detection:
+                for frame_idx in batch_frames:
+                    session.remember_roi(results[frame_idx], frame_size)
+
+            logger.info(f"Pass 1: Detection progress {batch_frames[-1] + 1}/{total_frames}")
+
+        return results
+
+    def _detect_bisect(self, session, frames, fps, batch_size, max_bbox_percent,
+                       enhanced_detection=False, roi_detection=False, cache=None):
+        """
+        Adaptive keyframe search: detect at a coarse stride, then bisect only the intervals
+        whose neighbouring keyframes disagree until each change point is pinned to the frame.
+
+        Returns:
+            (keyframes, keyframe_bboxes) - sorted keyframe indices and their bbox lists
+        """
+        total_frames = frames.shape[0]
+        stride = max(1, int(round(fps * BISECT_COARSE_SECONDS)))
+        coarse = list(range(0, total_frames, stride))
+        if coarse[-1] != total_frames - 1:
+            coarse.append(total_frames - 1)
+
+        results = self._detect_keyframes(
+            session, frames, coarse, batch_size, max_bbox_percent, enhanced_detection, roi_detection, cache
+        )
+        if not any(results.values()):
+            logger.info(f"Bisect schedule: no watermark in {len(coarse)} coarse keyframes")
+            return coarse, results
+
+        pending = [
+            (a, b) for a, b in zip(coarse, coarse[1:])
+            if b - a > 1 and not bbox_sets_match(results[a], results[b])
+        ]
+        rounds = 0
+        while pending:
+            rounds += 1
+            midpoints = sorted({(a + b) // 2 for a, b in pending})
+            results.update(self._detect_keyframes(
+                session, frames, midpoints, batch_size, max_bbox_percent, enhanced_detection, roi_detection, cache
+            ))
+
+            next_pending = []
+            for a, b in pending:
+                mid = (a + b) // 2
+                if mid - a > 1 and not bbox_sets_match(results[a], results[mid]):
+                    next_pending.append((a, mid))
+                if b - mid > 1 and not bbox_sets_match(results[mid], results[b]):
+                    next_pending.append((mid, b))
+            pending = next_pending
+
+        keyframes = sorted(results)
+        logger.info(f"Bisect schedule: {len(keyframes)} Florence calls for {total_frames} frames "
+                    f"({len(coarse)} coarse, {rounds} bisection rounds)")
+        return keyframes, results
+
+    def _detect_track(self, session, frames, fps, detection_skip, max_bbox_percent,
+                      enhanced_detection=False, roi_detection=False, cache=None):
+        """
+        Florence-2 keyframes plus OpenCV template tracking in between.
+
+        After a Florence-2 hit, each watermark patch is tracked frame by frame with
+        cv2.matchTemplate inside a small search window. Florence-2 runs again when any match
+        drops below TRACK_MATCH_THRESHOLD or TRACK_REFRESH_SECONDS have passed. While no
+        watermark is visible, Florence-2 runs every `detection_skip` frames.
+
+        Returns:
+            (keyframes, keyframe_bboxes) - sorted keyframe indices and their bbox lists
+        """
+        total_frames = frames.shape[0]
+        refresh_gap = max(1, int(round(fps * TRACK_REFRESH_SECONDS)))
+
+        results = {}
+        templates = []  # [(bbox, template), ...] cut from the last Florence-2 keyframe
+        last_detection = None
+        florence_calls = 0
+
+        frame_idx = 0
+        while frame_idx < total_frames:
+            gray = None
+            tracked = None
+
+            if templates and frame_idx - last_detection < refresh_gap:
+                gray = _frame_to_gray(frames[frame_idx])
+                tracked = []
+                for bbox, template in templates:
+                    new_bbox, score = track_template(gray, template, bbox)
+                    if score < TRACK_MATCH_THRESHOLD:
+                        tracked = None
+                        break
+                    tracked.append(new_bbox)
+
+            if tracked is not None:
+                results[frame_idx] = tracked
+                templates = [(bbox, template) for bbox, (_, template) in zip(tracked, templates)]
+                frame_idx += 1
+                continue
+
+            bboxes = self._detect_keyframes(
+                session, frames, [frame_idx], 1, max_bbox_percent, enhanced_detection, roi_detection, cache
+            )[frame_idx]
+            florence_calls += 1
+            last_detection = frame_idx
+            results[frame_idx] = bboxes
+
+            if bboxes:
+                gray = _frame_to_gray(frames[frame_idx]) if gray is None else gray
+                templates = [
+                    (bbox, gray[bbox[1]:bbox[3], bbox[0]:bbox[2]].copy())
+                    for bbox in bboxes
+                    if bbox[2] > bbox[0] and bbox[3] > bbox[1]
+                ]
+                frame_idx += 1
+            else:
+                templates = []
+                frame_idx += detection_skip
+
+        keyframes = sorted(results)
+        logger.info(f"Track schedule: {florence_calls} Florence calls, "
+                    f"{len(keyframes) - florence_calls} template-tracked frames out of {total_frames}")
+        return keyframes, results
+
+    def _render_frames(self, img_tensors, bboxes, sharpen_strength=0.0, bbox_padding=10, inpaint_batch_size=1,
+                       inpaint_reuse_threshold=0.0, inpaint_keyframe_interval=1):
+        """
+        Fill the same bbox regions in consecutive frames of one size with self.inpaint_engine.
+
+        Only context windows of INPAINT_CROP_MARGIN pixels around the padded bboxes are cut out
+        and inpainted, inpaint_batch_size crops per batched forward pass. The masked pixels of each
+        window are written into a copy of the original frame; every other pixel is returned
+        untouched. Returns one IMAGE tensor per input frame.
+
+        With inpaint_reuse_threshold > 0, a window whose INPAINT_REUSE_RING context ring differs
+        from the last inpainted frame's ring by at most that mean absolute difference (0-1)
+        reuses that frame's fill instead of inpainting again. Only the windows of the latest call
+        are kept for reuse.
+
+        With inpaint_keyframe_interval K > 1, the engine only fills every Kth frame and the last frame
+        of the call; the frames in between get their fill by warping both neighbouring keyframe
+        fills along optical flow and blending them by temporal distance. Callers render frames
+        in order, so the previous call's last frame anchors the next call when the windows match.
+        """
+        # The anchor only continues the directly preceding call
+        anchor, self.flow_anchor = self.flow_anchor, None
+        if not bboxes:
+            # No watermark, keep original
+            return list(img_tensors)
+
+        start = time.time()
+        stats = self.render_stats
+        engine = self.inpaint_engine
+        height, width = img_tensors[0].shape[:2]
+        padded = pad_and_clip(bboxes, bbox_padding, (width, height))
+        # Mask rectangles include their x2/y2 edge, so even context-free windows need a 1 pixel margin
+        margin = INPAINT_CROP_MARGIN if engine.uses_context else 1
+        reuse = inpaint_reuse_threshold > 0 and engine.uses_context
+        propagate = inpaint_keyframe_interval > 1 and engine.uses_context
+        windows = []  # (x1, y1, x2, y2, masked, ring, key) - every frame shares the windows and their masks
+        for x1, y1, x2, y2 in union_merge(context_windows(padded, margin, (width, height))).tolist():
+            inside = ((padded[:, :2] >= [x1, y1]) & (padded[:, 2:] <= [x2, y2])).all(axis=1)
+            mask = np.array(bbox_mask((x2 - x1, y2 - y1), padded[inside] - [x1, y1, x1, y1]))
+            ring = None
+            if reuse:
+                kernel = np.ones((2 * INPAINT_REUSE_RING + 1,) * 2, dtype=np.uint8)
+                ring = torch.from_numpy((cv2.dilate(mask, kernel) > 0) & (mask == 0))
+            key = (x1, y1, x2, y2) + tuple(map(tuple, padded[inside].tolist()))
+            windows.append((x1, y1, x2, y2, mask, ring, key))
+        if reuse:
+            # Fills of windows this call no longer covers would only hold memory
+            keys = {window[6] for window in windows}
+            self.inpaint_reuse = {key: reference for key, reference in self.inpaint_reuse.items() if key in keys}
+
+        if not propagate or anchor is None or anchor[0] != tuple(window[6] for window in windows):
+            anchor = None
+        # With an anchor as keyframe -1, the next inpainted keyframe is K frames after it
+        first = inpaint_keyframe_interval - 1 if anchor is not None else 0
+        inpaint_frames = sorted(set(range(first, len(img_tensors), inpaint_keyframe_interval)) | {len(img_tensors) - 1})
+
+        outputs = [img_tensor.clone() for img_tensor in img_tensors]
+        # Each (frame, window) is filled from a crop inpainted in this call (its index in
+        # crops), from the fill tensor of an earlier, reused inpainting, or by flow (None)
+        crops, crop_masks, sources = [], [], []
+        for index, img_tensor in enumerate(img_tensors):
+            if index not in inpaint_frames:
+                sources.extend([None] * len(windows))
+                continue
+            for x1, y1, x2, y2, mask, ring, key in windows:
+                region = img_tensor[y1:y2, x1:x2]
+                if reuse and ring.any():
+                    ring_pixels = region[ring.to(region.device)]
+                    reference = self.inpaint_reuse.get(key)
+                    stats["reuse_checks"] += 1
+                    if reference is not None:
+                        error = (ring_pixels - reference["ring"]).abs().mean().item()
+                        if error <= inpaint_reuse_threshold:
+                            stats["reused"] += 1
+                            stats["max_reuse_error"] = max(stats["max_reuse_error"], error)
+                            sources.append(reference["source"])
+                            continue
+                    self.inpaint_reuse[key] = {"ring": ring_pixels, "source": len(crops)}
+                sources.append(len(crops))
+                crops.append((region.cpu().numpy() * 255).astype(np.uint8))
+                crop_masks.append(mask)
+
+        fills = []
+        for crop_result, mask in zip(self._inpaint_crops(crops, crop_masks, inpaint_batch_size), crop_masks):
+            # Apply sharpening if enabled
+            if sharpen_strength > 0 and engine.uses_context:
+                crop_result = sharpen_image(crop_result, sharpen_strength)
+            fills.append(torch.from_numpy(crop_result[mask > 0]).to(outputs[0].device, outputs[0].dtype) / 255.0)
+        for reference in self.inpaint_reuse.values():
+            if isinstance(reference["source"], int):
+                reference["source"] = fills[reference["source"]]
+
+        sources = iter(sources)
+        for output in outputs:
+            for x1, y1, x2, y2, mask, _, _ in windows:
+                source = next(sources)
+                if source is None:
+                    continue
+                region = output[y1:y2, x1:x2]
+                region[torch.from_numpy(mask > 0).to(output.device)] = (
+                    fills[source] if isinstance(source, int) else source
+                )
+        if propagate:
+            self.flow_anchor = self._propagate_fills(img_tensors, outputs, windows, inpaint_frames, anchor)
+        # Crop in the engine's dtype and mask in, uint8 inpainted crop out
+        itemsize = engine.preferred_dtype.itemsize
+        stats["crop_bytes"] += sum(crop.size * itemsize + crop.nbytes + mask.nbytes for crop, mask in zip(crops, crop_masks))
+        stats["inpainted_crops"] += len(crops)
+
+        stats["frames"] += len(outputs)
+        stats["seconds"] += time.time() - start
+        stats["frame_bytes"] += len(outputs) * height * width * (3 * itemsize + 4)  # the same for whole frames
+        return outputs
+
+    @staticmethod
+    def _empty_render_stats():
+        return {"frames": 0, "seconds": 0.0, "crop_bytes": 0, "frame_bytes": 0,
+                "reuse_checks": 0, "reused": 0, "max_reuse_error": 0.0, "inpainted_crops": 0, "propagated": 0}
+
+    def _propagate_fills(self, img_tensors, outputs, windows, inpaint_frames, anchor=None):
+        """
+        Fill the windows of frames between inpainted keyframes from both keyframes' warped fills.
+
+        anchor holds the windows of the frame just before img_tensors and acts as keyframe -1.
+        Returns the anchor for the next call: the windows of the last frame, always a keyframe.
+        """
+        keyframes = {-1: anchor[1]} if anchor is not None else {}  # frame -> [(gray, fill), ...] per window
+        for index in inpaint_frames:
+            keyframes[index] = []
+            for x1, y1, x2, y2, _, _, _ in windows:
+                original = (img_tensors[index][y1:y2, x1:x2].cpu().numpy() * 255).astype(np.uint8)
+                fill = outputs[index][y1:y2, x1:x2].cpu().numpy().astype(np.float32)
+                keyframes[index].append((cv2.cvtColor(original, cv2.COLOR_RGB2GRAY), fill))
+
+        schedule = sorted(keyframes)
+        for previous, following in zip(schedule, schedule[1:]):
+            for index in range(previous + 1, following):
+                weight = (index - previous) / (following - previous)
+                for w, (x1, y1, x2, y2, mask, _, _) in enumerate(windows):
+                    target = (img_tensors[index][y1:y2, x1:x2].cpu().numpy() * 255).astype(np.uint8)
+                    target = cv2.cvtColor(target, cv2.COLOR_RGB2GRAY)
+                    blended = 0
+                    for keyframe, share in ((previous, 1 - weight), (following, weight)):
+                        gray, fill = keyframes[keyframe][w]
+                        blended = blended + share * warp_by_flow(fill, masked_optical_flow(target, gray, mask))
+                    region = outputs[index][y1:y2, x1:x2]
+                    region[torch.from_numpy(mask > 0).to(region.device)] = (
+                        torch.from_numpy(blended[mask > 0]).to(region.device, region.dtype)
+                    )
+                    self.render_stats["propagated"] += 1
+        return tuple(window[6] for window in windows), keyframes[inpaint_frames[-1]]
+
+    def _inpaint_crops(self, crops, masks, batch_size=1):
+        """
+        Fill RGB uint8 crops with self.inpaint_engine and return RGB uint8 results in input order.
+
+        Crops the engine accepts in a batch go through inpaint_batch() batch_size at a time; the
+        rest (too large, or an engine without batching) are filled one at a time.
+        """
+        engine = self.inpaint_engine
+        results = [None] * len(crops)
+        batched = [i for i, crop in enumerate(crops) if batch_size > 1 and engine.accepts_batch(crop)]
+        if batched:
+            try:
+                filled = engine.inpaint_batch([crops[i] for i in batched], [masks[i] for i in batched], batch_size)
+                for i, result in zip(batched, filled):
+                    results[i] = result
+            except RuntimeError as e:
+                # e.g. a LaMA export that only accepts a batch of one
+                logger.warning(f"Batched {engine.name} inference failed, inpainting one crop at a time: {e}")
+                engine.supports_batch = False
+
+        for i, (crop, mask) in enumerate(zip(crops, masks)):
+            if results[i] is None:
+                results[i] = engine.inpaint(crop, mask)
+        return results
+
+    def _select_inpaint_engine(self, name, quality_mode="balanced"):
+        """Build the named engine, keeping the current one (and a batching fallback it hit) if unchanged."""
+        key = (name, quality_mode, id(self.lama_model))
+        if self.inpaint_engine is None or self.inpaint_engine_key != key:
+            self.inpaint_engine = create_inpaint_engine(
+                name, model_manager=self.lama_model, quality_mode=quality_mode, device=self.device
+            )
+            self.inpaint_engine_key = key
+        engine = self.inpaint_engine
+        logger.info(f"Inpainting engine: {engine.name} on {engine.device} ({engine.preferred_dtype})"
+                    + (f" (batched up to {engine.max_crop_size or 'any'} px crops)" if engine.supports_batch else ""))
+        return engine
+
+    def _log_render_stats(self):
+        """Log per-frame inpainting latency and the bytes handed to the backend, then reset the counters."""
+        stats = self.render_stats
+        if stats["frames"]:
+            frames = stats["frames"]
+            logger.info(f"Inpainting ({self.inpaint_engine.name}): {frames} frames, {frames / max(stats['seconds'], 1e-9):.2f} frames/s "
+                        f"({stats['seconds'] / frames * 1000:.1f} ms/frame), "
+                        f"{stats['crop_bytes'] / frames / 1024:.0f} KB/frame through inpainting crops "
+                        f"(full frames: {stats['frame_bytes'] / frames / 1024:.0f} KB/frame)")
+        if stats["reuse_checks"]:
+            logger.info(f"Inpaint reuse: {stats['reused']}/{stats['reuse_checks']} crops reused "
+                        f"({stats['reused'] / stats['reuse_checks']:.0%}), "
+                        f"max context ring error {stats['max_reuse_error']:.4f}")
+        if stats["propagated"]:
+            logger.info(f"Flow propagation: {stats['propagated']} crops warped from neighbouring keyframes, "
+                        f"{stats['inpainted_crops']} crops inpainted")
+        self.render_stats = self._empty_render_stats()
+
+    def _run_pipeline(self, session, frames, keyframes, batch_size, max_bbox_percent, enhanced_detection,
+                      roi_detection, cache, fade_in_frames, fade_out_frames, render, render_batch_size=1):
+        """
+        Streamed Pass 1 + Pass 2: detection runs ahead in a thread while finished frames are inpainted.
+
+        Keyframes are detected in order. A frame f can only be covered by keyframes up to
+        f + fade_in_frames, so once all of those are detected its bbox list is final and it is
+        rendered exactly as the two-pass path would render it. Detected batches are handed over
+        through a queue of PIPELINE_QUEUE_DEPTH entries; queue depth and the busy share of
+        each stage are logged at the end. Final frames sharing the same boxes are rendered
+        render_batch_size at a time, in the same chunks as the two-pass path.
+
+        Returns:
+            (result_frames, detections) - rendered IMAGE tensors for every frame and the
+            keyframe -> bboxes dict of keyframes with a watermark
+        """
+        total_frames = frames.shape[0]
+        next_keyframe = dict(zip(keyframes, keyframes[1:] + [total_frames]))
+        pool = None if roi_detection else self.detection_pool
+        chunk_size = batch_size * (len(pool.workers) if pool is not None else 1)
+        chunks = [keyframes[start:start + chunk_size] for start in range(0, len(keyframes), chunk_size)]
+
+        handoff = queue.Queue(maxsize=PIPELINE_QUEUE_DEPTH)
+        stop = threading.Event()
+        detect_busy = [0.0]
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    handoff.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def detect():
+            try:
+                # inference_mode is thread-local
+                with torch.inference_mode():
+                    for chunk in chunks:
+                        start = time.time()
+                        chunk_bboxes = self._detect_keyframes(
+                            session, frames, chunk, batch_size, max_bbox_percent,
+                            enhanced_detection, roi_detection, cache
+                        )
+                        detect_busy[0] += time.time() - start
+                        if not put((chunk, chunk_bboxes)):
+                            return
+            except Exception as e:
+                put(e)
+
+        detections = {}
+        timeline = MaskTimeline(total_frames)
+        result_frames = []
+        detected = 0  # keyframes detected so far, always a prefix of `keyframes`
+        depth_samples = []
+        render_busy = 0.0
+        render_wait = 0.0
+
+        pipeline_start = time.time()
+        worker = threading.Thread(target=detect, name="watermark-detection", daemon=True)
+        worker.start()
+        try:
+            while len(result_frames) < total_frames:
+                if detected < len(keyframes):
+                    depth_samples.append(handoff.qsize())
+                    start = time.time()
+                    item = handoff.get()
+                    render_wait += time.time() - start
+                    if isinstance(item, Exception):
+                        raise item
+                    chunk, chunk_bboxes = item
+                    for det_frame in chunk:
+                        bboxes = chunk_bboxes[det_frame]
+                        if bboxes:
+                            detections[det_frame] = bboxes
+                            timeline.add_detection(det_frame, bboxes, next_keyframe[det_frame],
+                                                   fade_in_frames, fade_out_frames)
+                    detected += len(chunk)
+
+                # Frames before the next undetected keyframe's fade-in window are final
+                if detected < len(keyframes):
+                    final_end = min(total_frames, max(0, keyframes[detected] - fade_in_frames))
+                else:
+                    final_end = total_frames
+
+                while len(result_frames) < final_end:
+                    frame_idx = len(result_frames)
+                    bboxes = timeline.active(frame_idx)
+                    chunk_end = frame_idx + 1
+                    while (chunk_end < final_end and chunk_end - frame_idx < render_batch_size
+                           and timeline.active(chunk_end) == bboxes):
+                        chunk_end += 1
+                    if chunk_end == final_end < total_frames and chunk_end - frame_idx < render_batch_size:
+                        # The chunk may still grow; wait so the chunks match the two-pass path's
+                        break
+                    start = time.time()
+                    result_frames.extend(render(frames[frame_idx:chunk_end], bboxes))
+                    render_busy += time.time() - start
+                    if any(idx % 10 == 0 for idx in range(frame_idx, chunk_end)):
+                        logger.info(f"Pipeline: Inpainting progress {frame_idx}/{total_frames} "
+                                    f"({detected}/{len(keyframes)} keyframes detected)")
+        finally:
+            stop.set()
+            worker.join()
+
+        wall = max(time.time() - pipeline_start, 1e-9)
+        logger.info(
+            f"Pipeline: {wall:.1f}s wall, detection busy {detect_busy[0] / wall:.0%}, "
+            f"inpainting busy {render_busy / wall:.0%} (waited {render_wait:.1f}s for detection), "
+            f"queue depth mean {sum(depth_samples) / max(1, len(depth_samples)):.1f} / "
+            f"max {max(depth_samples, default=0)} of {PIPELINE_QUEUE_DEPTH}"
+        )
+        return result_frames, detections
+
+    @torch.inference_mode()
     def remove_watermark(self, frames, detection_prompt, max_bbox_percent, fps,
                         detection_skip=1, fade_in=0.0, fade_out=0.0, transparent=False, quality_mode="balanced",
-                        enhanced_detection=False, sharpen_strength=0.0, bbox_padding=10):
+                        enhanced_detection=False, sharpen_strength=0.0, bbox_padding=10,
+                        detection_batch_size=DEFAULT_DETECTION_BATCH_SIZE, roi_detection=False,
+                        detection_schedule="uniform", detection_cache=False, florence_precision="fp32",
+                        detector_model=DEFAULT_DETECTOR_MODEL, execution_mode="eager", detection_workers=0,
+                        pipeline=False, bbox_stabilization="off", bbox_interpolation="hold",
+                        inpaint_batch_size=1, inpaint_reuse_threshold=0.0, inpaint_keyframe_interval=1,
+                        inpaint_backend="lama"):
         """
         Remove watermarks from video frames using two-pass processing.
 
         Args:
             frames: ComfyUI IMAGE tensor (B, H, W, C) where B is number of frames
-            detection_prompt: Text prompt for watermark detection
+            detection_prompt: Text prompt for watermark detection; several prompts can be separated by "|"
             max_bbox_percent: Maximum bbox size as percentage of image
             fps: Frames per second of the video
-            detection_skip: Detect watermarks every N frames (1-10)
+            detection_skip: Detect watermarks every N frames (1-60)
             fade_in: Extend mask backwards by N seconds for fade-in watermarks
             fade_out: Extend mask forwards by N seconds for fade-out watermarks
             transparent: Make watermark regions transparent instead of inpainting
@@ -514,14 +2104,85 @@ class SoraVideoWatermarkRemover:
             enhanced_detection: Use multi-threshold detection for faint watermarks
             sharpen_strength: Post-processing sharpening strength (0.0-2.0)
             bbox_padding: Expand bbox by N pixels on all sides to ensure full watermark coverage
+            detection_batch_size: Number of detection frames per batched Florence-2 generate() call
+            roi_detection: After the first hit, detect only in native-resolution windows around known
+                watermark positions, falling back to the full frame when the windows come up empty
+            detection_schedule: How Pass 1 picks keyframes
+                - "uniform": every detection_skip frames
+                - "motion": at scene cuts and where the watermark bands change (at most every
+                  detection_skip frames), skipping unchanged spans
+                - "bisect": once per second, then bisect intervals whose keyframes disagree
+                  until every change point is pinned to the frame
+                - "track": Florence-2 keyframes, OpenCV template tracking on the frames in between
+            detection_cache: Reuse detections stored in ~/.cache/jm-sora-watermark-remover for identical
+                frames and detection settings (not used with roi_detection)
+            florence_precision: Florence-2 weights in "fp32", "bf16" or "int8" (dynamic, CPU only);
+                reduced precision falls back to fp32 if it fails the accuracy gate on this clip
+            detector_model: Florence-2 size ("base" or "large"), HuggingFace id or local checkpoint path
+            execution_mode: "eager", or "compiled" to torch.compile the Florence-2 vision encoder and
+                freeze LaMA; compiled artifacts are cached on disk for later runs
+            detection_workers: Number of Florence-2 replica processes for Pass 1 on CPU, each pinned to
+                its own cores (0 = detect in this process). The workers stay alive between runs.
+                Not used with roi_detection; the track schedule keeps only one worker busy
+            pipeline: Inpaint frames while detection is still running (uniform and motion schedules);
+                the output is identical to the two-pass result
+            bbox_stabilization: "off", "median" or "envelope" - cluster Pass 1 boxes into watermark
+                tracks and replace each track segment's boxes with their median or union box
+            bbox_interpolation: "hold" keeps each keyframe's boxes until the next keyframe; "linear"
+                moves matched boxes linearly between keyframes and covers jumps with both positions
+            inpaint_batch_size: Mask crops per LaMA forward pass; frames sharing the same boxes are
+                batched (1 = one iopaint call per crop)
+            inpaint_reuse_threshold: Reuse the previous inpainting of a window while the mean absolute
+                difference (0-1) of the pixels around its mask stays below this (0 = always run LaMA)
+            inpaint_keyframe_interval: Run LaMA on every Nth frame of a run and fill the frames in
+                between by warping the neighbouring fills along optical flow (1 = LaMA on every frame)
+            inpaint_backend: Registered inpainting engine (see inpaint_engines.py): "lama", OpenCV "telea" /
+                "navier_stokes" inpainting, or "smear" (edge-aware interpolation); the classical engines
+                need no LaMA model and are much faster on CPU. Ignored when transparent is set
 
         Returns:
             Processed IMAGE tensor (video frames)
         """
         # Load models
-        self.load_models(transparent)
-
         total_frames = frames.shape[0]
+        calibration_images = []
+        if florence_precision != "fp32":
+            step = max(1, total_frames // PRECISION_CALIBRATION_FRAMES)
+            for frame_idx in range(0, total_frames, step)[:PRECISION_CALIBRATION_FRAMES]:
+                img_np = (frames[frame_idx].cpu().numpy() * 255).astype(np.uint8)
+                calibration_images.append(Image.fromarray(img_np))
+        engine_name = "transparent" if transparent else inpaint_backend
+        skip_lama = not INPAINT_ENGINES[engine_name].needs_lama
+        use_pool = False
+        if detection_workers > 0:
+            if self.device != "cpu":
+                logger.warning(f"detection_workers only applies to CPU detection, running on {self.device} instead")
+            elif roi_detection:
+                logger.warning("ROI detection keeps per-run window state and runs in-process, "
+                               "detection_workers is ignored")
+            else:
+                use_pool = True
+                if detection_schedule == "track":
+                    logger.info("The track schedule detects one keyframe at a time, "
+                                "only one detection worker is busy at once")
+                if execution_mode == "compiled":
+                    logger.warning("Detection workers run Florence-2 eagerly, execution_mode=\"compiled\" "
+                                   "only applies to LaMA")
+        # Workers load their own replicas; this process only needs Florence-2 for the precision gate
+        florence = not use_pool or florence_precision != "fp32"
+        self.load_models(skip_lama, florence_precision, calibration_images, detection_prompt, detector_model,
+                         florence)
+        self._apply_execution_mode(execution_mode, skip_lama, florence=not use_pool)
+        self._select_inpaint_engine(engine_name, quality_mode)
+
+        self.detection_pool = None
+        if use_pool:
+            pool_precision = self.florence_precision if florence else "fp32"
+            # Aliases, HuggingFace ids and paths of the same checkpoint share one pool
+            self.detection_pool = get_detection_pool(
+                detection_workers, resolve_florence_model_id(detector_model), pool_precision
+            )
+
         logger.info(f"Processing video: {total_frames} frames at {fps} fps")
 
         # Convert seconds to frames
@@ -533,116 +2194,116 @@ class SoraVideoWatermarkRemover:
         # ========== PASS 1: DETECTION (sparse) ==========
         logger.info("Pass 1: Detecting watermarks...")
         detections = {}  # frame_idx -> [bbox, bbox, ...]
-        detection_frames = list(range(0, total_frames, detection_skip))
-
-        for frame_idx in detection_frames:
-            # Convert frame to PIL Image
-            img_tensor = frames[frame_idx]
-            img_np = (img_tensor.cpu().numpy() * 255).astype(np.uint8)
-            pil_image = Image.fromarray(img_np)
-
-            # Detect watermarks - use enhanced detection if enabled
-            if enhanced_detection:
-                bboxes = detect_with_enhanced_sensitivity(
-                    pil_image,
-                    self.florence_model,
-                    self.florence_processor,
-                    self.device,
-                    max_bbox_percent,
-                    detection_prompt
-                )
-            else:
-                bboxes = detect_only(
-                    pil_image,
-                    self.florence_model,
-                    self.florence_processor,
-                    self.device,
-                    max_bbox_percent,
-                    detection_prompt
-                )
+        if detection_schedule == "motion":
+            detection_frames = plan_motion_keyframes(frames, fps, min_gap=detection_skip)
+        else:
+            detection_frames = list(range(0, total_frames, detection_skip))
+        detection_prompts = parse_detection_prompts(detection_prompt)
+        if len(detection_prompts) > 1:
+            logger.info(f"Multi-prompt detection (shared image encoding): {detection_prompts}")
+        if use_pool:
+            session = FlorenceDetectionSession(None, None, self.device, detection_prompts)
+        else:
+            session = FlorenceDetectionSession(
+                self.florence_model, self.florence_processor, self.device, detection_prompts
+            )
 
+        # ROI detections depend on the windows learned earlier in the run, not just the frame
+        cache = self._get_detection_cache() if detection_cache and not roi_detection else None
+        if detection_cache and roi_detection:
+            logger.info("Detection cache is not used with roi_detection")
+        render = functools.partial(
+            self._render_frames, sharpen_strength=sharpen_strength, bbox_padding=bbox_padding, inpaint_batch_size=inpaint_batch_size,
+            inpaint_reuse_threshold=inpaint_reuse_threshold, inpaint_keyframe_interval=inpaint_keyframe_interval
+        )
+        # Each render call holds inpaint_batch_size inpainted keyframes and the frames propagated between them
+        render_chunk = inpaint_batch_size * inpaint_keyframe_interval
+        self.inpaint_reuse = {}
+        self.flow_anchor = None
+        if inpaint_reuse_threshold > 0 and bbox_interpolation == "linear":
+            logger.info("Linear bbox interpolation moves the boxes every frame, "
+                        "inpaint_reuse_threshold only applies while they stay identical")
+
+        pipelined = (pipeline and detection_schedule in PIPELINE_SCHEDULES
+                     and bbox_stabilization == "off" and bbox_interpolation == "hold")
+        if pipeline and detection_schedule not in PIPELINE_SCHEDULES:
+            logger.info(f"The {detection_schedule} schedule picks keyframes from earlier results, running two-pass")
+        elif pipeline and not pipelined:
+            logger.info("Bbox stabilization and interpolation need the following keyframes' boxes, running two-pass")
+
+        if pipelined:
+            result_frames, keyframe_bboxes = self._run_pipeline(
+                session, frames, detection_frames, detection_batch_size, max_bbox_percent,
+                enhanced_detection, roi_detection, cache, fade_in_frames, fade_out_frames, render,
+                render_chunk
+            )
+        elif detection_schedule == "bisect":
+            detection_frames, keyframe_bboxes = self._detect_bisect(
+                session, frames, fps, detection_batch_size,
+                max_bbox_percent, enhanced_detection, roi_detection, cache
+            )
+        elif detection_schedule == "track":
+            detection_frames, keyframe_bboxes = self._detect_track(
+                session, frames, fps, detection_skip,
+                max_bbox_percent, enhanced_detection, roi_detection, cache
+            )
+        else:
+            keyframe_bboxes = self._detect_keyframes(
+                session, frames, detection_frames, detection_batch_size,
+                max_bbox_percent, enhanced_detection, roi_detection, cache
+            )
+        for frame_idx, bboxes in keyframe_bboxes.items():
             if bboxes:
                 detections[frame_idx] = bboxes
 
-            if frame_idx % 10 == 0:
-                logger.info(f"Pass 1: Detection progress {frame_idx}/{total_frames}")
-
+        if bbox_stabilization != "off" and detections:
+            raw_boxes = {tuple(bbox) for bboxes in detections.values() for bbox in bboxes}
+            detections = stabilize_bbox_tracks(detections, detection_frames, bbox_stabilization)
+            stable_boxes = {tuple(bbox) for bboxes in detections.values() for bbox in bboxes}
+            logger.info(f"Bbox stabilization ({bbox_stabilization}): {len(raw_boxes)} distinct boxes "
+                        f"-> {len(stable_boxes)} track boxes")
+
+        session.log_stats()
+        if self.detection_pool is not None:
+            self.detection_pool.log_stats()
+        if cache is not None:
+            cache.log_stats()
+        if execution_mode == "compiled":
+            # All Florence-2 graphs for this run exist now; persist them for the next run
+            save_compile_cache()
         logger.info(f"Pass 1 complete: found watermarks in {len(detections)} detection points")
 
-        # ========== TIMELINE EXPANSION ==========
-        # Create frame->bbox mapping with fade in/out expansion
-        frame_masks = {}  # frame_idx -> [bbox, ...]
-
-        for det_frame, bboxes in detections.items():
-            # Expand backwards (fade in)
-            start_frame = max(0, det_frame - fade_in_frames)
-            # Expand forwards (fade out) + include frames until next detection point
-            end_frame = min(total_frames, det_frame + detection_skip + fade_out_frames)
-
-            for f in range(start_frame, end_frame):
-                if f not in frame_masks:
-                    frame_masks[f] = []
-                # Add bboxes, avoiding duplicates
-                for bbox in bboxes:
-                    if bbox not in frame_masks[f]:
-                        frame_masks[f].append(bbox)
-
-        logger.info(f"Timeline expanded: {len(frame_masks)} frames will have inpainting applied")
-
-        # ========== PASS 2: INPAINTING ==========
-        logger.info("Pass 2: Applying inpainting...")
-        result_frames = []
+        if not detections:
+            # Nothing to remove - skip timeline expansion and inpainting entirely
+            logger.info("No watermark detected, returning the input frames unchanged")
+            return (frames,)
+
+        if not pipelined:
+            # ========== TIMELINE EXPANSION ==========
+            # Each bbox is active from its keyframe's fade-in to the next keyframe's fade-out
+            # (or interpolated towards the next keyframe's matching box)
+            timeline = MaskTimeline.from_detections(
+                detections, detection_frames, total_frames, fade_in_frames, fade_out_frames, bbox_interpolation
+            )
+            logger.info(f"Timeline expanded: {timeline.covered_frames()} frames will have inpainting applied")
 
-        for frame_idx in range(total_frames):
-            img_tensor = frames[frame_idx]
-            img_np = (img_tensor.cpu().numpy() * 255).astype(np.uint8)
-            pil_image = Image.fromarray(img_np)
-
-            if frame_idx in frame_masks:
-                # This frame needs inpainting
-                # Create mask from bboxes
-                mask = Image.new("L", pil_image.size, 0)
-                draw = ImageDraw.Draw(mask)
-                for bbox in frame_masks[frame_idx]:
-                    x1, y1, x2, y2 = bbox
-                    # Apply padding to ensure full watermark coverage
-                    x1 = max(0, x1 - bbox_padding)
-                    y1 = max(0, y1 - bbox_padding)
-                    x2 = min(pil_image.width, x2 + bbox_padding)
-                    y2 = min(pil_image.height, y2 + bbox_padding)
-                    draw.rectangle([x1, y1, x2, y2], fill=255)
-
-                # Apply inpainting or transparency
-                if transparent:
-                    result_image = make_region_transparent(pil_image, mask)
-                    background = Image.new("RGB", result_image.size, (255, 255, 255))
-                    background.paste(result_image, mask=result_image.split()[3])
-                    result_image = background
-                else:
-                    lama_result = process_image_with_lama(
-                        np.array(pil_image),
-                        np.array(mask),
-                        self.lama_model,
-                        quality_mode=quality_mode
-                    )
-                    result_image = Image.fromarray(cv2.cvtColor(lama_result, cv2.COLOR_BGR2RGB))
+            # ========== PASS 2: INPAINTING ==========
+            logger.info("Pass 2: Applying inpainting...")
+            result_frames = []
 
-                    # Apply sharpening if enabled
-                    if sharpen_strength > 0:
-                        result_np_temp = np.array(result_image)
-                        sharpened_np = sharpen_image(result_np_temp, sharpen_strength)
-                        result_image = Image.fromarray(sharpened_np)
-            else:
-                # No watermark, keep original
-                result_image = pil_image
+            for run_start, run_end, bboxes in timeline.runs(include_empty=True):
+                # Frames of a run share their boxes, so their crops can be inpainted in one batch
+                for chunk_start in range(run_start, run_end, render_chunk):
+                    chunk_end = min(run_end, chunk_start + render_chunk)
+                    result_frames.extend(render(frames[chunk_start:chunk_end], bboxes))
 
-            # Convert to tensor
-            result_np = np.array(result_image).astype(np.float32) / 255.0
-            result_tensor = torch.from_numpy(result_np)
-            result_frames.append(result_tensor)
+                    if any(frame_idx % 10 == 0 for frame_idx in range(chunk_start, chunk_end)):
+                        logger.info(f"Pass 2: Inpainting progress {chunk_start}/{total_frames}")
 
-            if frame_idx % 10 == 0:
-                logger.info(f"Pass 2: Inpainting progress {frame_idx}/{total_frames}")
+        # Reused fills and the flow anchor hold frame data; release them with the run
+        self.inpaint_reuse = {}
+        self.flow_anchor = None
+        self._log_render_stats()
 
         # Stack all frames
         output = torch.stack(result_frames)
@@ -11,7 +11,8 @@ from PIL import Image
 import torch
 
 # 导入节点代码
-from nodes import detect_only, detect_with_enhanced_sensitivity
+from nodes import detect_only, detect_with_enhanced_sensitivity, load_florence2_model
+from timeline import MaskTimeline
 
 def simulate_video_processing(video_path, detection_prompt="watermark", max_bbox_percent=15.0,
                               fps=30.0, detection_skip=1, fade_in=1.0, fade_out=1.0,
@@ -35,12 +36,8 @@ def simulate_video_processing(video_path, detection_prompt="watermark", max_bbox
     device = "cuda" if torch.cuda.is_available() else ("mps" if hasattr(torch.backends, 'mps') and torch.backends.mps.is_available() else "cpu")
     print(f"使用设备: {device}")
 
-    from transformers import AutoProcessor, Florence2ForConditionalGeneration
     print("加载Florence-2模型...")
-    model = Florence2ForConditionalGeneration.from_pretrained(
-        "florence-community/Florence-2-large"
-    ).to(device).eval()
-    processor = AutoProcessor.from_pretrained("florence-community/Florence-2-large")
+    model, processor = load_florence2_model(device)
     print("✓ 模型加载完成")
     print()
 
@@ -115,24 +112,24 @@ def simulate_video_processing(video_path, detection_prompt="watermark", max_bbox
     print("时间线扩展 (模拟ComfyUI扩展逻辑)")
     print("=" * 60)
 
-    frame_masks = {}  # frame_idx -> [bbox, ...]
+    timeline = MaskTimeline(total_frames)
 
     for det_frame, bboxes in detections.items():
-        # 这是ComfyUI中的扩展逻辑
+        # 这是ComfyUI中的扩展逻辑：从 fade_in 之前一直到下一个检测点之后的 fade_out
+        timeline.add_detection(det_frame, bboxes, det_frame + detection_skip, fade_in_frames, fade_out_frames)
         start_frame = max(0, det_frame - fade_in_frames)
         end_frame = min(total_frames, det_frame + detection_skip + fade_out_frames)
-
         print(f"检测点 {det_frame}: 扩展到 [{start_frame}, {end_frame}) 共 {end_frame - start_frame} 帧")
 
-        for f in range(start_frame, end_frame):
-            if f not in frame_masks:
-                frame_masks[f] = []
-            for bbox in bboxes:
-                if bbox not in frame_masks[f]:
-                    frame_masks[f].append(bbox)
+    print()
+    print("合并后的区间:")
+    for bbox in timeline.bboxes:
+        x1, y1, x2, y2 = bbox
+        intervals = ", ".join(f"[{start}, {end})" for start, end in timeline.intervals(bbox))
+        print(f"  bbox ({x1:4d}, {y1:4d}) → ({x2:4d}, {y2:4d}): {intervals}")
 
     print()
-    print(f"扩展完成: {len(frame_masks)} 帧将被修复")
+    print(f"扩展完成: {timeline.covered_frames()} 帧将被修复")
     print()
 
     # ========== 分析覆盖情况 ==========
@@ -146,14 +143,12 @@ def simulate_video_processing(video_path, detection_prompt="watermark", max_bbox
 
     for frame_idx in range(min(100, total_frames)):
         timestamp = frame_idx / fps
-        if frame_idx in frame_masks:
-            num_bboxes = len(frame_masks[frame_idx])
+        active = timeline.active(frame_idx)
+        if active:
+            num_bboxes = len(active)
             # 显示bbox位置
-            bbox_info = ""
-            if frame_masks[frame_idx]:
-                first_bbox = frame_masks[frame_idx][0]
-                x1, y1, x2, y2 = first_bbox
-                bbox_info = f" bbox: ({x1:4d}, {y1:4d}) → ({x2:4d}, {y2:4d})"
+            x1, y1, x2, y2 = active[0]
+            bbox_info = f" bbox: ({x1:4d}, {y1:4d}) → ({x2:4d}, {y2:4d})"
             print(f"  ✓ 第{frame_idx:3d}帧 ({timestamp:5.2f}秒): 将修复 {num_bboxes} 个区域{bbox_info}")
         else:
             print(f"  ✗ 第{frame_idx:3d}帧 ({timestamp:5.2f}秒): **不会被修复** ⚠️")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+测试检测框运算 - 不需要加载模型
+用法：python test_bbox_ops.py
+
+bbox_ops 的向量化实现必须与逐框循环（benchmark_bbox_ops.py 中保留的重构前写法）结果一致，
+并正确处理空输入、零面积框和越过图像边界的框。
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bbox_ops import (
+    area_percent, as_boxes, context_windows, greedy_match, iou_matrix, nms, pad_and_clip, union_merge,
+)
+from benchmark_bbox_ops import (
+    IMAGE_SIZE, loop_area_filter, loop_iou_matrix, loop_nms, loop_pad_and_clip, loop_union_merge, make_boxes,
+)
+
+
+def test_empty_inputs():
+    """空输入得到空结果"""
+    assert as_boxes([]).shape == (0, 4)
+    assert iou_matrix([], [[0, 0, 1, 1]]).shape == (0, 1)
+    assert len(nms([])) == 0
+    assert union_merge([]).shape == (0, 4)
+    assert greedy_match([[0, 0, 10, 10]], [], 0.3).tolist() == [-1]
+
+
+def test_matches_loops():
+    """面积过滤、IoU矩阵、NMS、合并、外扩裁剪与逐框循环一致"""
+    for seed in range(5):
+        bboxes = make_boxes(300, seed)
+        keep = area_percent(bboxes, IMAGE_SIZE) <= 1.0
+        assert as_boxes(bboxes)[keep].tolist() == loop_area_filter(bboxes, 1.0)
+        assert np.allclose(iou_matrix(bboxes, bboxes), loop_iou_matrix(bboxes))
+        assert as_boxes(bboxes)[nms(bboxes)].tolist() == loop_nms(bboxes)
+        assert union_merge(bboxes).tolist() == loop_union_merge(bboxes)
+        assert pad_and_clip(bboxes, 10, IMAGE_SIZE).tolist() == loop_pad_and_clip(bboxes, 10)
+
+
+def test_degenerate_boxes():
+    """零面积框与任何框的IoU为0，相同框的IoU为1"""
+    ious = iou_matrix([[5, 5, 5, 20], [0, 0, 10, 10]], [[0, 0, 10, 10], [5, 5, 5, 20]])
+    assert ious.tolist() == [[0.0, 0.0], [1.0, 0.0]]
+    assert as_boxes([[1.9, 2.5, 3.1, 4.99]]).tolist() == [[1, 2, 3, 4]]
+
+
+def test_union_merge_leaves_no_overlap():
+    """合并后任意两个框都不重叠，且覆盖所有输入框"""
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        boxes = rng.integers(0, 200, size=(30, 2))
+        boxes = np.concatenate([boxes, boxes + rng.integers(1, 40, size=(30, 2))], axis=1)
+        merged = union_merge(boxes)
+        ious = iou_matrix(merged, merged)
+        assert (ious[~np.eye(len(merged), dtype=bool)] == 0).all()
+        inside = ((boxes[:, None, :2] >= merged[None, :, :2]) & (boxes[:, None, 2:] <= merged[None, :, 2:])).all(axis=2)
+        assert inside.any(axis=1).all()
+
+
+def test_context_windows_stay_inside():
+    """贴边的窗口平移回图像内并尽量保持尺寸，始终包含原框"""
+    image_size = (100, 80)
+    windows = context_windows([[0, 0, 10, 10], [95, 70, 100, 80], [40, 30, 50, 40]], 20, image_size)
+    assert windows.tolist() == [[0, 0, 50, 50], [55, 30, 100, 80], [20, 10, 70, 60]]
+    # 图像比窗口小时裁剪到整张图
+    assert context_windows([[10, 10, 20, 20]], 100, (50, 40)).tolist() == [[0, 0, 50, 40]]
+
+    rng = np.random.default_rng(1)
+    boxes = rng.integers(0, 90, size=(200, 2))
+    boxes = np.concatenate([boxes, np.minimum(boxes + rng.integers(1, 30, size=(200, 2)), image_size)], axis=1)
+    windows = context_windows(boxes, 16, image_size)
+    assert (windows[:, :2] >= 0).all() and (windows[:, 2:] <= image_size).all()
+    assert ((windows[:, :2] <= boxes[:, :2]) & (windows[:, 2:] >= boxes[:, 2:])).all()
+
+
+def test_greedy_match():
+    """按顺序一对一匹配，低于阈值的框留给后面的框"""
+    boxes = [[0, 0, 10, 10], [100, 100, 110, 110], [1, 1, 11, 11]]
+    others = [[1, 0, 11, 10], [300, 300, 310, 310]]
+    assert greedy_match(boxes, others, 0.3).tolist() == [0, -1, -1]
+    assert greedy_match(boxes[1:], others, 0.3).tolist() == [-1, 0]
+
+
+def main():
+    tests = [
+        test_empty_inputs,
+        test_matches_loops,
+        test_degenerate_boxes,
+        test_union_merge_leaves_no_overlap,
+        test_context_windows_stay_inside,
+        test_greedy_match,
+    ]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"\n全部 {len(tests)} 项通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+测试检测框轨迹稳定与 track 调度 - 不需要加载模型
+用法：python test_bbox_tracks.py
+
+stabilize_bbox_tracks 要把抖动的关键帧检测框按IoU聚成轨迹段，每段换成中位数框或并集框；
+track 调度在关键帧之间用模板匹配跟踪水印，只在跟丢或到达刷新间隔时调用检测。
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import torch
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+import nodes
+from nodes import stabilize_bbox_tracks
+
+
+def jittered_detections():
+    """两个水印，每个关键帧的框抖动1-2像素；第二个水印的框顺序在各帧之间打乱"""
+    keyframes = [0, 5, 10, 15, 20]
+    detections = {
+        0: [[100, 50, 160, 70], [10, 200, 60, 220]],
+        5: [[11, 201, 61, 219], [101, 49, 161, 71]],
+        10: [[99, 51, 159, 70], [9, 199, 59, 221]],
+        15: [[102, 50, 162, 72], [10, 200, 62, 220]],
+        20: [[100, 52, 160, 70], [12, 201, 60, 220]],
+    }
+    return detections, keyframes
+
+
+def test_median_clusters_tracks():
+    """每个关键帧得到每条轨迹的同一个中位数框"""
+    detections, keyframes = jittered_detections()
+    stabilized = stabilize_bbox_tracks(detections, keyframes, "median")
+    assert list(stabilized) == keyframes
+    for frame in keyframes:
+        assert sorted(stabilized[frame]) == [[10, 200, 60, 220], [100, 50, 160, 70]], frame
+
+
+def test_envelope_covers_every_box():
+    """并集模式的框包住该轨迹所有关键帧的框"""
+    detections, keyframes = jittered_detections()
+    stabilized = stabilize_bbox_tracks(detections, keyframes, "envelope")
+    for frame in keyframes:
+        assert sorted(stabilized[frame]) == [[9, 199, 62, 221], [99, 49, 162, 72]], frame
+
+
+def test_gaps_and_jumps_split_segments():
+    """缺失的关键帧结束轨迹段，位置跳变开始新轨迹段"""
+    keyframes = [0, 5, 10, 15, 20, 25]
+    detections = {
+        0: [[0, 0, 40, 20]],
+        5: [[1, 0, 41, 20]],
+        # 10: 水印消失
+        15: [[2, 1, 42, 21]],
+        20: [[200, 100, 240, 120]],
+        25: [[201, 101, 241, 121]],
+    }
+    stabilized = stabilize_bbox_tracks(detections, keyframes, "median")
+    assert 10 not in stabilized
+    assert stabilized[0] == stabilized[5] == [[0, 0, 40, 20]]
+    assert stabilized[15] == [[2, 1, 42, 21]]
+    assert stabilized[20] == stabilized[25] == [[200, 100, 240, 120]]
+
+
+def test_off_and_empty():
+    """off 原样返回，空检测得到空结果"""
+    detections, keyframes = jittered_detections()
+    assert stabilize_bbox_tracks(detections, keyframes, "off") is detections
+    assert stabilize_bbox_tracks({}, keyframes, "median") == {}
+
+
+class KnownClipSession:
+    """替身检测会话：按帧内容查出该帧的真实水印框，并记录调用次数"""
+
+    def __init__(self, frames, truth):
+        self.frames, self.truth = frames, truth
+        self.prompts = ["watermark"]
+        self.calls = 0
+
+    def detect_raw_batch(self, images):
+        results = []
+        for image in images:
+            self.calls += 1
+            index = next(i for i, frame in enumerate(self.frames) if torch.equal(frame, image))
+            results.append([(bbox, 1.0) for bbox in self.truth.get(index, [])])
+        return results
+
+
+def test_track_schedule_follows_moving_watermark():
+    """水印每帧右移1像素：跟踪框与真实位置一致，只在首帧和刷新间隔处调用检测"""
+    rng = np.random.default_rng(0)
+    total_frames, fps, detection_skip = 40, 10.0, 5
+    background = 0.3 + 0.02 * rng.random((60, 120, 3))
+    patch = rng.random((12, 20, 3))
+    frames, truth = [], {}
+    for index in range(total_frames):
+        frame = background.copy()
+        if index < 30:
+            x, y = 10 + index, 20
+            frame[y:y + 12, x:x + 20] = patch
+            truth[index] = [[x, y, x + 20, y + 12]]
+        frames.append(torch.from_numpy(frame).float())
+    frames = torch.stack(frames)
+
+    session = KnownClipSession(frames, truth)
+    node = nodes.SoraVideoWatermarkRemover()
+    keyframes, results = node._detect_track(session, frames, fps, detection_skip, 50.0)
+
+    for index in range(30):
+        assert results[index] == truth[index], index
+    # 第30帧水印消失：跟丢后调用检测，之后每 detection_skip 帧检测一次
+    assert [frame for frame in keyframes if frame >= 30] == [30, 35]
+    assert all(results[frame] == [] for frame in (30, 35))
+    refresh_gap = int(round(fps * nodes.TRACK_REFRESH_SECONDS))
+    assert session.calls == len([0, refresh_gap, 30, 35])
+
+
+def main():
+    tests = [
+        test_median_clusters_tracks,
+        test_envelope_covers_every_box,
+        test_gaps_and_jumps_split_segments,
+        test_off_and_empty,
+        test_track_schedule_follows_moving_watermark,
+    ]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"\n全部 {len(tests)} 项通过")
+
+
+if __name__ == "__main__":
+    main()
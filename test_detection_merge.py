@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+测试多提示词检测结果合并 - 不需要加载模型
+用法：python test_detection_merge.py
+
+合并后再按 max_bbox_percent 过滤，必须与先过滤每个提示词的结果再合并一致：
+过大的框不能挤掉与它重叠、但符合面积限制的较小框。
+"""
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+import nodes
+from detection_cache import DetectionCache
+from nodes import (
+    _merge_prompt_detections, enhanced_filter_raw_detections, filter_raw_detections,
+)
+
+IMAGE_SIZE = (1000, 1000)
+
+
+def raw(bbox):
+    """(bbox, area_percent) 形式的原始检测"""
+    x1, y1, x2, y2 = bbox
+    return (bbox, (x2 - x1) * (y2 - y1) / (IMAGE_SIZE[0] * IMAGE_SIZE[1]) * 100)
+
+
+def test_oversized_box_does_not_suppress_valid_box():
+    """前一个提示词的过大框与后一个提示词的有效框重叠"""
+    merged = _merge_prompt_detections([[([0, 0, 400, 400], 40.0)], [([50, 50, 360, 360], 8.0)]])
+    assert filter_raw_detections(merged, 10.0) == [[50, 50, 360, 360]]
+    assert enhanced_filter_raw_detections(merged, 10.0) == [[50, 50, 360, 360]]
+
+
+def test_duplicates_are_dropped():
+    """重复框保留较小的一个（面积相同时保留前一个提示词的），结果保持提示词顺序"""
+    merged = _merge_prompt_detections([
+        [raw([10, 10, 110, 60]), raw([500, 500, 540, 540])],
+        [raw([12, 12, 112, 62]), raw([502, 502, 538, 538]), raw([700, 100, 800, 150])],
+    ])
+    assert [bbox for bbox, _ in merged] == [[10, 10, 110, 60], [502, 502, 538, 538], [700, 100, 800, 150]]
+    assert _merge_prompt_detections([[], []]) == []
+
+
+def test_merge_then_filter_matches_filter_then_merge():
+    """随机检测框：合并后过滤 == 先过滤再合并"""
+    rng = random.Random(0)
+    for _ in range(500):
+        per_prompt = []
+        for _ in range(rng.randint(2, 4)):
+            detections = []
+            for _ in range(rng.randint(0, 6)):
+                x, y = rng.randint(0, 800), rng.randint(0, 800)
+                detections.append(raw([x, y, x + rng.randint(1, 600), y + rng.randint(1, 600)]))
+            per_prompt.append(detections)
+        max_percent = rng.choice([1.0, 5.0, 10.0, 30.0])
+
+        after = filter_raw_detections(_merge_prompt_detections(per_prompt), max_percent)
+        filtered_first = [[d for d in detections if d[1] <= max_percent] for detections in per_prompt]
+        before = filter_raw_detections(_merge_prompt_detections(filtered_first), max_percent)
+        assert sorted(after) == sorted(before), (per_prompt, max_percent)
+
+
+def test_detect_raw_splits_prompts():
+    """detect_raw 与 detect_raw_batch 一样按 "|" 拆分提示词"""
+    calls = []
+    original_batch, original_identify = nodes.detect_raw_batch, nodes.identify
+    nodes.detect_raw_batch = lambda images, model, processor, device, prompts, *args: calls.append(prompts) or [[]]
+    nodes.identify = lambda task, image, prompt, *args: calls.append(prompt) or {}
+    try:
+        image = type("Image", (), {"size": IMAGE_SIZE})()
+        nodes.detect_raw(image, None, None, "cpu", "watermark | logo")
+        nodes.detect_raw(image, None, None, "cpu", " watermark ")
+    finally:
+        nodes.detect_raw_batch, nodes.identify = original_batch, original_identify
+    assert calls == [["watermark", "logo"], "watermark"], calls
+
+
+def test_cache_key_uses_normalized_prompts():
+    """单帧检测与关键帧检测用同样规范化的提示词生成缓存键，写法不同的同一组提示词命中同一条缓存"""
+    calls = []
+    original = nodes.detect_raw
+    nodes.detect_raw = lambda image, model, processor, device, prompt: calls.append(prompt) or [([5, 5, 20, 20], 1.0)]
+    image = np.zeros((32, 32, 3), dtype=np.uint8)
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DetectionCache(Path(directory) / "detections.sqlite")
+            for detect in (nodes.detect_only, nodes.detect_with_enhanced_sensitivity):
+                calls.clear()
+                for prompt in ("watermark | logo", "watermark|logo", ["watermark", " logo "]):
+                    assert detect(image, None, None, "cpu", 10.0, prompt, cache=cache) == [[5, 5, 20, 20]]
+                assert len(calls) == 1, detect.__name__
+            # _detect_keyframes 以 session.prompts 生成的键与上面写入的键相同
+            prompts = nodes.parse_detection_prompts("watermark | logo")
+            key = cache.make_key(cache.frame_hash(image), prompts, 10.0, nodes._model_id(None), False)
+            assert cache.get(key) == [[5, 5, 20, 20]]
+            cache.close()
+    finally:
+        nodes.detect_raw = original
+
+
+def main():
+    tests = [
+        test_oversized_box_does_not_suppress_valid_box,
+        test_duplicates_are_dropped,
+        test_merge_then_filter_matches_filter_then_merge,
+        test_detect_raw_splits_prompts,
+        test_cache_key_uses_normalized_prompts,
+    ]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"\n全部 {len(tests)} 项通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,7 +13,7 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 def test_detection_precision(video_path, output_dir="detection_tests"):
     """测试不同参数的检测效果"""
-    from nodes import load_florence2_model, detect_watermark_bboxes_only
+    from nodes import load_florence2_model, detect_only
     
     # 创建输出目录
     output_path = Path(output_dir)
@@ -60,8 +60,8 @@ def test_detection_precision(video_path, output_dir="detection_tests"):
         print(f"  - max_bbox_percent: {max_pct}%")
         
         # 检测
-        bboxes = detect_watermark_bboxes_only(
-            image, model, processor, device, prompt, max_pct
+        bboxes = detect_only(
+            image, model, processor, device, max_pct, prompt
         )
         
         # 绘制结果
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+测试修复后端 - 不需要加载LaMA模型
+用法：python test_inpaint_engines.py
+
+smear 填充只在掩码外接框外扩1像素的范围内计算，结果必须与在整张裁剪图上计算一致，
+包括贴着裁剪边界的掩码；所有后端都不能改动掩码外的像素。
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import torch
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from inpaint_engines import (
+    INPAINT_ENGINES, InpaintEngine, _smear_rows, create_inpaint_engine, inpaint_crops_batched, smear_inpaint,
+)
+
+
+def full_crop_smear(image, mask):
+    """在整张裁剪图上计算的 smear（外接框裁剪优化之前的写法）"""
+    result = image.copy()
+    hole = mask > 0
+    row_fill, row_weight = _smear_rows(image, hole)
+    column_fill, column_weight = _smear_rows(image.transpose(1, 0, 2), hole.T)
+    column_fill, column_weight = column_fill.transpose(1, 0, 2), column_weight.T
+    total = row_weight + column_weight
+    blended = (row_fill * row_weight[:, :, None] + column_fill * column_weight[:, :, None]) / np.maximum(total, 1e-12)[:, :, None]
+    fillable = hole & (total > 0)
+    result[fillable] = np.clip(np.round(blended[fillable]), 0, 255).astype(np.uint8)
+    return result
+
+
+def random_case(rng, height=40, width=56):
+    """随机图像和若干矩形掩码，矩形可以贴着或越过裁剪边界"""
+    image = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    mask = np.zeros((height, width), dtype=np.uint8)
+    for _ in range(rng.integers(1, 4)):
+        x, y = rng.integers(-5, width), rng.integers(-5, height)
+        w, h = rng.integers(1, 20, size=2)
+        mask[max(y, 0):max(y + h, 0), max(x, 0):max(x + w, 0)] = 255
+    return image, mask
+
+
+def test_smear_matches_full_crop():
+    """外接框裁剪后的结果与整张裁剪图计算一致（含贴边掩码）"""
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        image, mask = random_case(rng)
+        assert np.array_equal(smear_inpaint(image, mask), full_crop_smear(image, mask))
+
+
+def test_smear_hole_touching_border():
+    """贴着裁剪边界的掩码只向有像素的一侧延伸"""
+    image = np.full((20, 30, 3), 90, dtype=np.uint8)
+    image[:, :, 1] = np.arange(20)[:, None] * 10
+    mask = np.zeros((20, 30), dtype=np.uint8)
+    mask[0:4, 0:6] = 255
+    result = smear_inpaint(image, mask)
+    # 左上角：行方向只有右侧像素，列方向只有下方像素，填充介于两者之间
+    assert (result[0:4, 0:6, 0] == 90).all() and (result[0:4, 0:6, 2] == 90).all()
+    fill = result[0:4, 0:6, 1]
+    assert ((fill >= image[0:4, 0:6, 1]) & (fill <= image[4, 0, 1])).all()
+
+    # 贯穿整行的掩码：行方向没有有效像素，只按列方向线性插值
+    mask = np.zeros((20, 30), dtype=np.uint8)
+    mask[5:9, :] = 255
+    result = smear_inpaint(image, mask)
+    assert np.array_equal(result[5:9], image[5:9])
+
+
+def test_smear_empty_and_full_mask():
+    """空掩码和整张掩码都原样返回（返回副本）"""
+    image = np.random.default_rng(1).integers(0, 256, size=(12, 16, 3), dtype=np.uint8)
+    for mask in (np.zeros((12, 16), dtype=np.uint8), np.full((12, 16), 255, dtype=np.uint8)):
+        result = smear_inpaint(image, mask)
+        assert result is not image and np.array_equal(result, image)
+
+
+def test_engines_keep_unmasked_pixels():
+    """经典后端只改动掩码内的像素"""
+    rng = np.random.default_rng(2)
+    for name in ("telea", "navier_stokes", "smear", "transparent"):
+        engine = create_inpaint_engine(name, device="cuda")
+        assert engine.device == "cpu" and engine.preferred_dtype == torch.uint8
+        for _ in range(20):
+            image, mask = random_case(rng)
+            result = engine.inpaint(image, mask)
+            assert result.shape == image.shape and result.dtype == np.uint8
+            assert np.array_equal(result[mask == 0], image[mask == 0]), name
+
+
+def test_registry():
+    """未知名称报错，基类是抽象类"""
+    try:
+        create_inpaint_engine("missing")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown engine accepted")
+    try:
+        InpaintEngine()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("abstract base instantiated")
+    assert INPAINT_ENGINES["lama"].needs_lama and not INPAINT_ENGINES["smear"].needs_lama
+
+
+def test_batched_lama_keeps_order_and_size():
+    """批量路径按填充后的尺寸分组，结果保持输入顺序和原始尺寸"""
+    class Lama:
+        device = "cpu"
+
+        @staticmethod
+        def model(image, mask):
+            return image * (1 - mask) + 0.5 * mask
+
+    manager = type("ModelManager", (), {"model": Lama()})()
+    rng = np.random.default_rng(3)
+    crops, masks = [], []
+    for height, width in [(30, 40), (17, 23), (30, 40), (8, 8), (31, 39)]:
+        crops.append(rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8))
+        mask = np.zeros((height, width), dtype=np.uint8)
+        mask[2:6, 3:7] = 255
+        masks.append(mask)
+
+    results = inpaint_crops_batched(crops, masks, manager, batch_size=2)
+    for crop, mask, result in zip(crops, masks, results):
+        assert result.shape == crop.shape
+        assert np.array_equal(result[mask == 0], crop[mask == 0])
+        assert (result[mask > 0] == 127).all()
+
+
+def main():
+    tests = [
+        test_smear_matches_full_crop,
+        test_smear_hole_touching_border,
+        test_smear_empty_and_full_mask,
+        test_engines_keep_unmasked_pixels,
+        test_registry,
+        test_batched_lama_keeps_order_and_size,
+    ]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"\n全部 {len(tests)} 项通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+测试检测/修复流水线 - 不需要加载模型
+用法：python test_pipeline.py
+
+用一个按像素找水印的替身检测会话代替Florence-2，用 smear 后端代替LaMA，
+比较 pipeline=True 与两遍处理的输出：各种检测间隔、淡入淡出、检测批大小和修复批大小下必须逐像素一致。
+"""
+import sys
+from pathlib import Path
+
+import torch
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+import nodes
+
+FPS = 10.0
+HEIGHT, WIDTH = 48, 64
+# (首帧, 末帧, 框)：水印区域像素为1.0，背景噪声低于0.9
+WATERMARKS = [
+    (6, 19, [8, 6, 24, 14]),
+    (15, 33, [40, 30, 58, 40]),
+    (27, 40, [10, 32, 22, 42]),
+]
+
+
+class StubSession:
+    """按纯白矩形检测水印的替身 FlorenceDetectionSession"""
+
+    def __init__(self, model, processor, device, detection_prompt="watermark", decode_budget=None):
+        self.prompts = nodes.parse_detection_prompts(detection_prompt)
+
+    def detect_raw_batch(self, images):
+        results = []
+        for image in images:
+            raw = []
+            for _, _, (x1, y1, x2, y2) in WATERMARKS:
+                if (image[y1:y2, x1:x2] == 1.0).all():
+                    raw.append(([x1, y1, x2, y2], (x2 - x1) * (y2 - y1) / (WIDTH * HEIGHT) * 100))
+            results.append(raw)
+        return results
+
+    def log_stats(self):
+        pass
+
+
+def make_frames(total_frames=44):
+    generator = torch.Generator().manual_seed(0)
+    frames = torch.rand(total_frames, HEIGHT, WIDTH, 3, generator=generator) * 0.9
+    for first, last, (x1, y1, x2, y2) in WATERMARKS:
+        frames[first:last + 1, y1:y2, x1:x2] = 1.0
+    return frames
+
+
+def make_node():
+    node = nodes.SoraVideoWatermarkRemover()
+    node.load_models = lambda *args, **kwargs: None
+    node._apply_execution_mode = lambda *args, **kwargs: None
+    return node
+
+
+def run(node, frames, pipeline, **options):
+    original = nodes.FlorenceDetectionSession
+    nodes.FlorenceDetectionSession = StubSession
+    try:
+        return node.remove_watermark(
+            frames, "watermark", 10.0, FPS, inpaint_backend="smear", detection_cache=False, pipeline=pipeline,
+            **options
+        )[0]
+    finally:
+        nodes.FlorenceDetectionSession = original
+
+
+def test_pipeline_matches_two_pass():
+    """检测间隔、淡入淡出、批大小的各种组合下流水线与两遍处理逐像素一致"""
+    frames = make_frames()
+    node = make_node()
+    cases = [
+        dict(detection_skip=1),
+        dict(detection_skip=3, fade_in=0.5, fade_out=0.3, detection_batch_size=2),
+        dict(detection_skip=7, fade_in=1.0, fade_out=1.0, detection_batch_size=3, inpaint_batch_size=4),
+        dict(detection_skip=5, fade_in=2.0, fade_out=0.0, detection_batch_size=1, inpaint_batch_size=3),
+        dict(detection_skip=4, fade_in=0.0, fade_out=2.0, detection_batch_size=16),
+        dict(detection_skip=2, fade_out=0.5, inpaint_batch_size=2, inpaint_keyframe_interval=3),
+        dict(detection_skip=3, detection_schedule="motion", inpaint_batch_size=2),
+        dict(detection_skip=3, fade_in=0.3, inpaint_reuse_threshold=0.01),
+    ]
+    for options in cases:
+        two_pass = run(node, frames, False, **options)
+        pipelined = run(node, frames, True, **options)
+        assert two_pass.shape == frames.shape
+        assert not torch.equal(two_pass, frames), options
+        assert torch.equal(two_pass, pipelined), options
+
+
+def test_no_watermark_returns_input():
+    """没有检测到水印时两种方式都原样返回输入"""
+    frames = torch.rand(12, HEIGHT, WIDTH, 3) * 0.9
+    node = make_node()
+    assert run(node, frames, True) is frames
+    assert run(node, frames, False) is frames
+
+
+def main():
+    tests = [
+        test_pipeline_matches_two_pass,
+        test_no_watermark_returns_input,
+    ]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"\n全部 {len(tests)} 项通过")
+
+
+if __name__ == "__main__":
+    main()
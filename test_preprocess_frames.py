@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+测试Florence-2预处理 - 不需要加载模型
+用法：python test_preprocess_frames.py
+
+preprocess_frames 用 torch 批量缩放归一化代替处理器的 PIL 路径。两者的双三次核舍入方式不同，
+CPU 上缩放后的像素与 PIL 结果最多相差 PREPROCESS_GRAY_TOLERANCE 个灰度级（主要出现在放大时）。
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import torch
+from PIL import Image
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from nodes import PREPROCESS_GRAY_TOLERANCE, _tensor_to_pil, preprocess_frames
+
+SIZE = 768
+MEAN = [0.485, 0.456, 0.406]
+STD = [0.229, 0.224, 0.225]
+
+
+class StubImageProcessor:
+    """与Florence-2图像处理器相同的配置：双三次缩放到 768x768，不裁剪，按ImageNet均值方差归一化"""
+
+    size = {"height": SIZE, "width": SIZE}
+    resample = 3
+    do_center_crop = False
+    image_mean = MEAN
+    image_std = STD
+
+    def __call__(self, frame):
+        """处理器的 PIL 路径：转 uint8、PIL 双三次缩放、除以255后归一化"""
+        resized = _tensor_to_pil(frame).resize((SIZE, SIZE), Image.BICUBIC)
+        pixels = np.asarray(resized, dtype=np.float32) / 255
+        return torch.from_numpy((pixels - MEAN) / STD).permute(2, 0, 1).float()
+
+
+def gray_level_error(pixel_values, frames):
+    """与 PIL 路径的逐像素差，换算回 0-255 灰度级"""
+    processor = StubImageProcessor()
+    expected = torch.stack([processor(frame) for frame in frames])
+    return (pixel_values - expected).abs() * torch.tensor(STD).view(1, -1, 1, 1) * 255
+
+
+def noise_frames(count, height, width, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    return torch.rand(count, height, width, 3, generator=generator)
+
+
+def test_matches_pil_within_tolerance():
+    """缩小、放大、原尺寸三种情况下与 PIL 路径的差不超过容差，平均误差远小于一个灰度级"""
+    for height, width in [(1080, 1920), (720, 1280), (768, 768), (300, 500), (500, 300)]:
+        frames = noise_frames(2, height, width)
+        pixel_values = preprocess_frames(frames, StubImageProcessor(), "cpu")
+        assert pixel_values.shape == (2, 3, SIZE, SIZE)
+        error = gray_level_error(pixel_values, frames)
+        assert error.max() <= PREPROCESS_GRAY_TOLERANCE + 1e-3, (height, width, error.max())
+        assert error.mean() < 0.5, (height, width, error.mean())
+
+
+def test_same_size_is_exact():
+    """不需要缩放时与 PIL 路径只差浮点误差"""
+    frames = noise_frames(2, SIZE, SIZE, seed=1)
+    error = gray_level_error(preprocess_frames(frames, StubImageProcessor(), "cpu"), frames)
+    assert error.max() < 1e-3
+
+
+def test_mixed_size_list_keeps_order():
+    """尺寸不同的帧列表按原顺序输出，结果与逐帧处理一致"""
+    frames = [noise_frames(1, *shape, seed=i)[0] for i, shape in enumerate([(300, 500), (720, 1280), (300, 500)])]
+    pixel_values = preprocess_frames(frames, StubImageProcessor(), "cpu")
+    assert pixel_values.shape == (3, 3, SIZE, SIZE)
+    for frame, values in zip(frames, pixel_values):
+        assert torch.equal(values, preprocess_frames(frame[None], StubImageProcessor(), "cpu")[0])
+    assert gray_level_error(pixel_values, frames).max() <= PREPROCESS_GRAY_TOLERANCE + 1e-3
+
+
+def test_unsupported_config_falls_back():
+    """中心裁剪或不支持的插值方式返回 None，由调用方改用处理器"""
+    cropping = StubImageProcessor()
+    cropping.do_center_crop = True
+    assert preprocess_frames(noise_frames(1, 32, 32), cropping, "cpu") is None
+    nearest = StubImageProcessor()
+    nearest.resample = 0
+    assert preprocess_frames(noise_frames(1, 32, 32), nearest, "cpu") is None
+
+
+def main():
+    tests = [
+        test_matches_pil_within_tolerance,
+        test_same_size_is_exact,
+        test_mixed_size_list_keeps_order,
+        test_unsupported_config_falls_back,
+    ]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"\n全部 {len(tests)} 项通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+测试 Pass 2 渲染 - 不需要加载LaMA模型
+用法：python test_render_frames.py
+
+用 smear 后端代替LaMA，检查 _render_frames 只裁剪上下文窗口修复后贴回的结果：
+掩码外的像素保持不变，掩码内与整帧修复一致；批量修复与逐帧修复的结果一致；
+背景不变时复用上一次的修复结果，背景变化后重新修复；
+沿光流传播的填充只落在掩码内，并接近逐帧修复的结果。
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import torch
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from nodes import SoraVideoWatermarkRemover, bbox_mask
+from inpaint_engines import SmearEngine, smear_inpaint
+
+HEIGHT, WIDTH = 480, 960
+BBOXES = [[10, 5, 60, 25], [40, 20, 90, 40], [880, 440, 960, 480]]  # 重叠的框和贴着右下角的框
+PADDING = 6
+
+
+class BatchedSmearEngine(SmearEngine):
+    """支持批量的 smear，记录每次 inpaint_batch 的批大小，可模拟批量推理失败"""
+
+    name = "batched_smear"
+    supports_batch = True
+    max_crop_size = 400
+
+    def __init__(self, fail=False, **options):
+        super().__init__(**options)
+        self.fail = fail
+        self.batches = []
+
+    def inpaint_batch(self, crops, masks, batch_size):
+        if self.fail:
+            raise RuntimeError("export only accepts a batch of one")
+        results = []
+        for start in range(0, len(crops), batch_size):
+            chunk = range(start, min(start + batch_size, len(crops)))
+            self.batches.append(len(chunk))
+            results.extend(self.inpaint(crops[i], masks[i]) for i in chunk)
+        return results
+
+
+def make_node(engine="smear"):
+    node = SoraVideoWatermarkRemover()
+    node._select_inpaint_engine(engine)
+    return node
+
+
+def random_frames(count, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    return torch.rand(count, HEIGHT, WIDTH, 3, generator=generator)
+
+
+def frame_mask(bboxes=BBOXES):
+    return np.array(bbox_mask((WIDTH, HEIGHT), bboxes, PADDING)) > 0
+
+
+def full_frame_smear(frame, bboxes=BBOXES):
+    """整帧修复的参考结果（裁剪之前的写法）"""
+    image = (frame.numpy() * 255).astype(np.uint8)
+    mask = np.array(bbox_mask((WIDTH, HEIGHT), bboxes, PADDING))
+    return smear_inpaint(image, mask)
+
+
+def test_crop_compositing_keeps_unmasked_pixels():
+    """掩码外的像素逐位不变，掩码内与整帧修复一致"""
+    node = make_node()
+    frames = random_frames(3)
+    outputs = node._render_frames(frames, BBOXES, bbox_padding=PADDING)
+    mask = torch.from_numpy(frame_mask())
+    for frame, output in zip(frames, outputs):
+        assert output.shape == frame.shape and output.dtype == frame.dtype
+        assert torch.equal(output[~mask], frame[~mask])
+        expected = full_frame_smear(frame)
+        assert np.array_equal((output[mask] * 255).round().to(torch.uint8).numpy(), expected[mask.numpy()])
+
+
+def test_no_boxes_returns_frames():
+    """没有框时原样返回"""
+    node = make_node()
+    frames = random_frames(2)
+    outputs = node._render_frames(frames, [])
+    assert len(outputs) == 2 and all(torch.equal(output, frame) for output, frame in zip(outputs, frames))
+
+
+def test_batched_matches_per_frame():
+    """批量修复与逐帧修复逐像素一致；超过 max_crop_size 的窗口单独修复"""
+    node = make_node()
+    frames = random_frames(7, seed=1)
+    per_frame = [node._render_frames(frames[i:i + 1], BBOXES, bbox_padding=PADDING)[0] for i in range(len(frames))]
+
+    node.inpaint_engine = BatchedSmearEngine()
+    batched = node._render_frames(frames, BBOXES, bbox_padding=PADDING, inpaint_batch_size=4)
+    assert all(torch.equal(a, b) for a, b in zip(batched, per_frame))
+    # 左上角两个框合并成一个窗口，右下角一个窗口，每帧两个窗口都不超过400像素：14个裁剪按4个一批
+    assert node.inpaint_engine.batches == [4, 4, 4, 2]
+
+    large = [[20, 20, 700, 400]]
+    node.inpaint_engine = BatchedSmearEngine()
+    node._render_frames(frames[:2], large, bbox_padding=PADDING, inpaint_batch_size=4)
+    assert node.inpaint_engine.batches == []
+
+
+def test_batch_failure_falls_back():
+    """批量推理失败时逐个修复，结果不变"""
+    node = make_node()
+    frames = random_frames(3, seed=2)
+    expected = node._render_frames(frames, BBOXES, bbox_padding=PADDING)
+    node.inpaint_engine = BatchedSmearEngine(fail=True)
+    outputs = node._render_frames(frames, BBOXES, bbox_padding=PADDING, inpaint_batch_size=4)
+    assert all(torch.equal(a, b) for a, b in zip(outputs, expected))
+    assert not node.inpaint_engine.supports_batch
+
+
+def test_reuse_follows_background():
+    """背景不变的帧复用修复结果，背景变化后重新修复，与不复用的结果一致"""
+    node = make_node()
+    still = random_frames(1, seed=3)[0]
+    changed = (still + 0.2).clamp(0, 1)
+    frames = torch.stack([still, still, still, changed, changed])
+    reference = [node._render_frames(frame[None], BBOXES, bbox_padding=PADDING)[0] for frame in frames]
+
+    node.render_stats = node._empty_render_stats()
+    outputs = node._render_frames(frames[:2], BBOXES, bbox_padding=PADDING, inpaint_reuse_threshold=0.01)
+    # 下一次调用继续复用同一窗口的结果
+    outputs += node._render_frames(frames[2:], BBOXES, bbox_padding=PADDING, inpaint_reuse_threshold=0.01)
+    assert all(torch.equal(a, b) for a, b in zip(outputs, reference))
+    # 每帧两个窗口：第2、3帧和第5帧复用，第1帧和背景变化的第4帧重新修复
+    assert node.render_stats["reuse_checks"] == 10 and node.render_stats["reused"] == 6
+    assert node.render_stats["inpainted_crops"] == 4
+
+
+def test_reuse_keeps_only_current_windows():
+    """换了检测框后只保留当前窗口的复用结果"""
+    node = make_node()
+    frames = random_frames(2, seed=4)
+    node._render_frames(frames, BBOXES, bbox_padding=PADDING, inpaint_reuse_threshold=0.01)
+    assert len(node.inpaint_reuse) == 2
+    node._render_frames(frames, BBOXES[:1], bbox_padding=PADDING, inpaint_reuse_threshold=0.01)
+    assert len(node.inpaint_reuse) == 1
+    assert all(key[4:] == ((4, 0, 66, 31),) for key in node.inpaint_reuse)
+
+
+def panning_frames(count, step=2):
+    """平滑纹理每帧水平平移 step 像素"""
+    y, x = np.mgrid[0:HEIGHT, 0:WIDTH + step * count].astype(np.float32)
+    texture = 0.5 + 0.2 * np.sin(x / 23) * np.cos(y / 31) + 0.1 * np.sin((x + y) / 11)
+    texture = np.repeat(texture[:, :, None], 3, axis=2) * [1.0, 0.9, 0.8]
+    return torch.from_numpy(np.stack([texture[:, i * step:i * step + WIDTH] for i in range(count)])).float()
+
+
+def test_flow_propagation_stays_in_mask():
+    """关键帧与逐帧修复相同，中间帧的填充只改动掩码内像素且误差很小"""
+    node = make_node()
+    frames = panning_frames(6)
+    reference = [node._render_frames(frame[None], BBOXES, bbox_padding=PADDING)[0] for frame in frames]
+
+    node.render_stats = node._empty_render_stats()
+    outputs = node._render_frames(frames, BBOXES, bbox_padding=PADDING, inpaint_keyframe_interval=3)
+    mask = torch.from_numpy(frame_mask())
+    for index, (frame, output) in enumerate(zip(frames, outputs)):
+        assert torch.equal(output[~mask], frame[~mask]), index
+        if index in (0, 3, 5):
+            assert torch.equal(output, reference[index]), index
+        else:
+            assert (output[mask] - reference[index][mask]).abs().mean() * 255 < 1.5, index
+    # 第1、2、4帧的两个窗口由光流传播
+    assert node.render_stats["inpainted_crops"] == 6 and node.render_stats["propagated"] == 6
+
+
+def main():
+    tests = [
+        test_crop_compositing_keeps_unmasked_pixels,
+        test_no_boxes_returns_frames,
+        test_batched_matches_per_frame,
+        test_batch_failure_falls_back,
+        test_reuse_follows_background,
+        test_reuse_keeps_only_current_windows,
+        test_flow_propagation_stays_in_mask,
+    ]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"\n全部 {len(tests)} 项通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+测试掩码时间线 - 不需要加载模型
+用法：python test_timeline.py
+
+区间时间线必须与原来逐帧展开的 frame_masks 字典给出相同的每帧检测框，
+并正确处理淡入淡出越过视频首尾、相邻区间合并和线性插值。
+"""
+import random
+import sys
+from pathlib import Path
+
+# 添加项目路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from timeline import MaskTimeline
+
+
+def expand_frame_masks(detections, keyframes, total_frames, fade_in_frames, fade_out_frames):
+    """原来的逐帧展开：frame_idx -> [bbox, ...]"""
+    frame_masks = {}
+    next_keyframe = dict(zip(keyframes, keyframes[1:] + [total_frames]))
+    for det_frame, bboxes in detections.items():
+        start_frame = max(0, det_frame - fade_in_frames)
+        end_frame = min(total_frames, next_keyframe[det_frame] + fade_out_frames)
+        for f in range(start_frame, end_frame):
+            if f not in frame_masks:
+                frame_masks[f] = []
+            for bbox in bboxes:
+                if bbox not in frame_masks[f]:
+                    frame_masks[f].append(bbox)
+    return frame_masks
+
+
+def random_detections(rng, total_frames):
+    positions = [[10, 10, 60, 30], [200, 150, 260, 170], [90, 300, 140, 320]]
+    skip = rng.randint(1, 12)
+    keyframes = list(range(0, total_frames, skip))
+    detections = {}
+    for frame in keyframes:
+        bboxes = [list(bbox) for bbox in positions if rng.random() < 0.5]
+        if bboxes:
+            detections[frame] = bboxes
+    return detections, keyframes
+
+
+def test_matches_frame_expansion():
+    """每帧检测框、覆盖帧数与逐帧展开一致"""
+    rng = random.Random(0)
+    for _ in range(300):
+        total_frames = rng.randint(1, 120)
+        detections, keyframes = random_detections(rng, total_frames)
+        fade_in, fade_out = rng.randint(0, 15), rng.randint(0, 15)
+        expected = expand_frame_masks(detections, keyframes, total_frames, fade_in, fade_out)
+        timeline = MaskTimeline.from_detections(detections, keyframes, total_frames, fade_in, fade_out)
+        for frame in range(total_frames):
+            assert sorted(timeline.active(frame)) == sorted(expected.get(frame, [])), frame
+        assert timeline.covered_frames() == len(expected)
+
+
+def test_runs_cover_every_frame():
+    """include_empty 时各段首尾相接覆盖整个视频，空段与 uncovered_runs 一致"""
+    rng = random.Random(1)
+    for _ in range(100):
+        total_frames = rng.randint(1, 120)
+        detections, keyframes = random_detections(rng, total_frames)
+        timeline = MaskTimeline.from_detections(detections, keyframes, total_frames, 2, 3)
+        runs = list(timeline.runs(include_empty=True))
+        assert runs[0][0] == 0 and runs[-1][1] == total_frames
+        assert all(end == next_start for (_, end, _), (next_start, _, _) in zip(runs, runs[1:]))
+        assert [(start, end) for start, end, boxes in runs if not boxes] == timeline.uncovered_runs()
+        for start, end, boxes in runs:
+            assert all(timeline.active(frame) == boxes for frame in range(start, end))
+
+
+def test_add_clamps_and_merges():
+    """区间裁剪到视频范围内，重叠或相接的区间合并"""
+    timeline = MaskTimeline(50)
+    bbox = [1, 2, 3, 4]
+    timeline.add(-5, 3, bbox)
+    timeline.add(3, 10, bbox)
+    timeline.add(20, 30, bbox)
+    timeline.add(45, 80, bbox)
+    timeline.add(60, 70, bbox)
+    timeline.add(8, 8, bbox)
+    assert timeline.intervals(bbox) == [(0, 10), (20, 30), (45, 50)]
+    timeline.add(9, 21, bbox)
+    assert timeline.intervals(bbox) == [(0, 30), (45, 50)]
+    assert timeline.active(50) == [] and timeline.active(-1) == []
+    assert MaskTimeline(0).covered_frames() == 0
+
+
+def test_linear_interpolation():
+    """匹配的框在关键帧之间线性移动，位置跳变时两处都覆盖整个间隔"""
+    timeline = MaskTimeline.from_detections(
+        {0: [[0, 0, 20, 10]], 10: [[10, 0, 30, 10]]}, [0, 10], 20, interpolation="linear"
+    )
+    assert timeline.active(0) == [[0, 0, 20, 10]]
+    assert timeline.active(5) == [[5, 0, 25, 10]]
+    assert timeline.active(15) == [[10, 0, 30, 10]]
+
+    jump = MaskTimeline.from_detections(
+        {0: [[0, 0, 20, 10]], 10: [[200, 100, 220, 110]]}, [0, 10], 20, interpolation="linear"
+    )
+    assert sorted(jump.active(5)) == [[0, 0, 20, 10], [200, 100, 220, 110]]
+    assert jump.active(0) == [[0, 0, 20, 10]]
+
+
+def main():
+    tests = [
+        test_matches_frame_expansion,
+        test_runs_cover_every_frame,
+        test_add_clamps_and_merges,
+        test_linear_interpolation,
+    ]
+    for test in tests:
+        test()
+        print(f"✓ {test.__name__}")
+    print(f"\n全部 {len(tests)} 项通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Interval-based watermark mask timeline.
+
+Each detected bbox is active over a half-open frame interval [start, end): from its
+keyframe's fade-in to the next keyframe's fade-out. Intervals of the same bbox are merged
+when they overlap or touch, so a static watermark detected at every keyframe becomes one
+interval. Per-frame queries and iteration go through a sweep over the interval endpoints,
+which splits the video into runs of consecutive frames that share the same set of boxes.
+
+Memory and work scale with the number of distinct intervals, not with frames x fade window.
+
+With interpolation, a box matched between consecutive keyframes moves linearly across the
+frames in between instead of being held; boxes that jump, appear or disappear cover the whole
+gap, since the frame where they switched is unknown.
+"""
+import bisect
+
+import numpy as np
+
+try:
+    from .bbox_ops import greedy_match
+except ImportError:
+    from bbox_ops import greedy_match
+
+# Boxes of consecutive keyframes with at least this IoU are the same watermark and get
+# interpolated; anything less is treated as a position jump
+INTERPOLATION_MATCH_IOU = 0.3
+
+
+class MaskTimeline:
+    """Frame intervals during which each watermark bbox must be inpainted."""
+
+    def __init__(self, total_frames: int):
+        self.total_frames = total_frames
+        self._intervals = {}  # bbox tuple -> sorted, disjoint [[start, end), ...]
+        self._segments = None  # cached sweep: [(start, end, [bbox, ...]), ...] covering all frames
+        self._segment_starts = None
+
+    @classmethod
+    def from_detections(cls, detections: dict, keyframes: list, total_frames: int,
+                        fade_in_frames: int = 0, fade_out_frames: int = 0, interpolation: str = "hold"):
+        """
+        Build the timeline of a keyframe -> bboxes dict, as the node expands detections.
+
+        interpolation is "hold" (keep each keyframe's boxes until the next keyframe) or
+        "linear" (see add_interpolated_detection).
+        """
+        timeline = cls(total_frames)
+        next_keyframe = dict(zip(keyframes, list(keyframes[1:]) + [total_frames]))
+        if interpolation == "linear":
+            # Every keyframe takes part, so boxes appearing after an empty keyframe cover the gap
+            for det_frame in keyframes:
+                next_frame = next_keyframe[det_frame]
+                timeline.add_interpolated_detection(
+                    det_frame, detections.get(det_frame, []), next_frame, detections.get(next_frame, []),
+                    fade_in_frames, fade_out_frames
+                )
+            return timeline
+
+        for det_frame, bboxes in detections.items():
+            timeline.add_detection(det_frame, bboxes, next_keyframe[det_frame], fade_in_frames, fade_out_frames)
+        return timeline
+
+    def add_detection(self, det_frame: int, bboxes: list, next_keyframe: int,
+                      fade_in_frames: int = 0, fade_out_frames: int = 0):
+        """Activate bboxes from det_frame's fade-in until the fade-out after the next keyframe."""
+        # Expand backwards (fade in), forwards until the next detection point plus fade out
+        start = det_frame - fade_in_frames
+        end = next_keyframe + fade_out_frames
+        for bbox in bboxes:
+            self.add(start, end, bbox)
+
+    def add_interpolated_detection(self, det_frame: int, bboxes: list, next_keyframe: int, next_bboxes: list,
+                                   fade_in_frames: int = 0, fade_out_frames: int = 0,
+                                   match_iou: float = INTERPOLATION_MATCH_IOU):
+        """
+        Add one keyframe's bboxes, moving them linearly towards the next keyframe's matching boxes.
+
+        Boxes are matched one-to-one by IoU. Unmatched boxes of this keyframe are held until the
+        next keyframe's fade-out, like add_detection; unmatched boxes of the next keyframe are
+        extended back to just after this keyframe. A position jump thus covers both positions
+        over the gap rather than leaving the frames between the jump and a keyframe uncovered.
+        """
+        for bbox in bboxes:
+            self.add(det_frame - fade_in_frames, det_frame + 1, bbox)
+
+        matches = greedy_match(bboxes, next_bboxes, match_iou)
+        gap = next_keyframe - det_frame
+        for bbox, match in zip(bboxes, matches):
+            if match < 0:
+                self.add(det_frame + 1, next_keyframe + fade_out_frames, bbox)
+                continue
+            start, end = np.asarray(bbox, dtype=float), np.asarray(next_bboxes[match], dtype=float)
+            for frame in range(det_frame + 1, next_keyframe):
+                step = (frame - det_frame) / gap
+                self.add(frame, frame + 1, np.round(start + (end - start) * step).astype(int).tolist())
+
+        appeared = sorted(set(range(len(next_bboxes))) - set(matches.tolist()))
+        for index in appeared:
+            self.add(det_frame + 1, next_keyframe, next_bboxes[index])
+
+    def add(self, start: int, end: int, bbox):
+        """Activate bbox on frames [start, end), clamped to the video and merged with its other intervals."""
+        start, end = max(0, start), min(self.total_frames, end)
+        if start >= end:
+            return
+        intervals = self._intervals.setdefault(tuple(bbox), [])
+
+        # Absorb every interval that overlaps or touches [start, end)
+        lo = bisect.bisect_left(intervals, [start, start])
+        if lo > 0 and intervals[lo - 1][1] >= start:
+            lo -= 1
+        hi = lo
+        while hi < len(intervals) and intervals[hi][0] <= end:
+            start = min(start, intervals[hi][0])
+            end = max(end, intervals[hi][1])
+            hi += 1
+        intervals[lo:hi] = [[start, end]]
+        self._segments = None
+
+    def intervals(self, bbox) -> list:
+        """Merged (start, end) intervals of one bbox."""
+        return [tuple(interval) for interval in self._intervals.get(tuple(bbox), [])]
+
+    @property
+    def bboxes(self) -> list:
+        """Every bbox on the timeline, in the order it was first added."""
+        return [list(bbox) for bbox in self._intervals]
+
+    def _sweep(self):
+        if self._segments is not None:
+            return self._segments
+
+        # +1 / -1 events per interval endpoint; bbox order follows first insertion
+        order = {bbox: rank for rank, bbox in enumerate(self._intervals)}
+        events = {}
+        for bbox, intervals in self._intervals.items():
+            for start, end in intervals:
+                events.setdefault(start, []).append((1, bbox))
+                events.setdefault(end, []).append((-1, bbox))
+
+        segments = []
+        active = set()
+        position = 0
+        for frame in sorted(events) + [self.total_frames]:
+            if frame > position:
+                boxes = [list(bbox) for bbox in sorted(active, key=order.get)]
+                if segments and segments[-1][1] == position and segments[-1][2] == boxes:
+                    segments[-1] = (segments[-1][0], frame, boxes)
+                else:
+                    segments.append((position, frame, boxes))
+                position = frame
+            for delta, bbox in events.get(frame, []):
+                if delta > 0:
+                    active.add(bbox)
+                else:
+                    active.discard(bbox)
+
+        self._segments = segments
+        self._segment_starts = [start for start, _, _ in segments]
+        return segments
+
+    def active(self, frame: int) -> list:
+        """bboxes to inpaint on one frame (empty list if none)."""
+        segments = self._sweep()
+        index = bisect.bisect_right(self._segment_starts, frame) - 1
+        if index < 0 or frame >= segments[index][1]:
+            return []
+        return segments[index][2]
+
+    def runs(self, include_empty: bool = False):
+        """Yield (start, end, bboxes) for maximal runs of frames that share the same boxes."""
+        for start, end, boxes in self._sweep():
+            if boxes or include_empty:
+                yield start, end, boxes
+
+    def covered_frames(self) -> int:
+        """Number of frames with at least one bbox."""
+        return sum(end - start for start, end, _ in self.runs())
+
+    def uncovered_runs(self) -> list:
+        """(start, end) runs of frames without any bbox."""
+        return [(start, end) for start, end, boxes in self._sweep() if not boxes]